@@ -0,0 +1,246 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from bisect import bisect
+from itertools import accumulate
+
+import degrees
+from graph import peak_rss
+
+# Report fields that describe how a benchmark was run rather than what it
+# measured, along with every cache's "budget"
+SETTINGS = ("directory", "backend", "queries", "seed", "landmarks", "tree_cache")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic datasets and benchmarks for degrees.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = commands.add_parser("generate", help="write a synthetic dataset")
+    generate_parser.add_argument("directory")
+    generate_parser.add_argument("--people", type=int, default=100000)
+    generate_parser.add_argument("--movies", type=int, default=50000)
+    generate_parser.add_argument(
+        "--cast-exponent", type=float, default=2.5,
+        help="power-law exponent of cast sizes"
+    )
+    generate_parser.add_argument(
+        "--min-cast", type=int, default=3,
+        help="smallest cast size"
+    )
+    generate_parser.add_argument(
+        "--popularity-exponent", type=float, default=0.8,
+        help="Zipf exponent of how often each person is cast"
+    )
+    generate_parser.add_argument("--seed", type=int, default=0)
+
+    run_parser = commands.add_parser("run", help="benchmark a dataset and print JSON")
+    run_parser.add_argument("directory")
+    run_parser.add_argument("--queries", type=int, default=1000)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument(
+        "--backend", choices=("memory", "sqlite"), default="memory"
+    )
+    run_parser.add_argument("--landmarks", type=int, default=0, metavar="K")
+    run_parser.add_argument(
+        "--tree-cache", action="store_true",
+        help="let shortest_path build and use cached BFS trees (memory backend only)"
+    )
+    run_parser.add_argument("--output", help="write the JSON report here instead of stdout")
+
+    compare_parser = commands.add_parser("compare", help="compare two JSON reports")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.add_argument(
+        "--force", action="store_true",
+        help="compare even if the reports were run with different settings"
+    )
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        generate(
+            args.directory, args.people, args.movies,
+            args.cast_exponent, args.min_cast, args.popularity_exponent, args.seed
+        )
+    elif args.command == "run":
+        report = run(
+            args.directory, args.queries, args.seed,
+            args.backend, args.landmarks, args.tree_cache
+        )
+        text = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+    else:
+        return compare(args.before, args.after, args.force)
+
+
+def generate(directory, people, movies, cast_exponent, min_cast, popularity_exponent, seed):
+    """
+    Write people.csv, movies.csv and stars.csv to `directory`.
+
+    Cast sizes follow a discrete power law with `cast_exponent` starting at
+    `min_cast`, and each cast member is drawn with Zipf weights
+    (`popularity_exponent`), so a few people star in many movies as in the
+    real dataset.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, "people.csv"), "w", encoding="utf-8") as f:
+        f.write("id,name,birth\n")
+        for i in range(people):
+            f.write(f'{i + 1},"Person {i + 1}",{rng.randint(1920, 2010)}\n')
+
+    with open(os.path.join(directory, "movies.csv"), "w", encoding="utf-8") as f:
+        f.write("id,title,year\n")
+        for i in range(movies):
+            f.write(f'{i + 1},"Movie {i + 1}",{rng.randint(1930, 2020)}\n')
+
+    # Drawing from cumulative weights is a binary search per cast member
+    weights = accumulate(1 / (rank + 1) ** popularity_exponent for rank in range(people))
+    cumulative = list(weights)
+    total = cumulative[-1]
+    with open(os.path.join(directory, "stars.csv"), "w", encoding="utf-8") as f:
+        f.write("person_id,movie_id\n")
+        for movie in range(movies):
+            size = min(people, int(min_cast * rng.paretovariate(cast_exponent - 1)))
+            cast = {bisect(cumulative, rng.random() * total) for _ in range(size)}
+            for person in cast:
+                f.write(f"{min(person, people - 1) + 1},{movie + 1}\n")
+
+
+def run(directory, queries, seed, backend, landmarks, tree_cache):
+    """
+    Time load_data, neighbors_for_person and shortest_path over a fixed,
+    seeded set of random queries, returning the measurements as a dict.
+    """
+    report = {
+        "directory": directory,
+        "backend": backend,
+        "queries": queries,
+        "seed": seed,
+        "landmarks": landmarks,
+        "tree_cache": tree_cache,
+    }
+
+    start = time.perf_counter()
+    degrees.load_data(directory, backend, snapshot=False)
+    report["load_seconds"] = time.perf_counter() - start
+    if backend == "memory":
+        # Loading again writes and then maps the snapshot
+        degrees.load_data(directory)
+        start = time.perf_counter()
+        degrees.load_data(directory)
+        report["load_snapshot_seconds"] = time.perf_counter() - start
+
+    if landmarks:
+        index = degrees.build_landmarks(landmarks)
+        report["landmark_seconds"] = index.build_seconds
+        report["landmark_bytes"] = index.nbytes()
+    if not tree_cache:
+        degrees.TREE_THRESHOLD = float("inf")
+
+    rng = random.Random(seed)
+    graph = degrees.graph
+    pairs = [
+        (graph.person_ids[rng.randrange(graph.person_count)],
+         graph.person_ids[rng.randrange(graph.person_count)])
+        for _ in range(queries)
+    ]
+
+    latencies = []
+    for source, _ in pairs:
+        start = time.perf_counter()
+        degrees.neighbors_for_person(source)
+        latencies.append(time.perf_counter() - start)
+    report["neighbors_for_person"] = summarize(latencies)
+
+    latencies = []
+    expanded = []
+    connected = 0
+    for source, target in pairs:
+        before = degrees.search_stats["expanded"]
+        start = time.perf_counter()
+        path = degrees.shortest_path(source, target)
+        latencies.append(time.perf_counter() - start)
+        expanded.append(degrees.search_stats["expanded"] - before)
+        connected += path is not None
+    report["shortest_path"] = summarize(latencies)
+    report["shortest_path"]["connected"] = connected
+    report["shortest_path"]["expanded_mean"] = sum(expanded) / max(1, len(expanded))
+    report["shortest_path"]["expanded_max"] = max(expanded, default=0)
+
+    report["caches"] = degrees.cache_stats()
+    report["peak_rss"] = peak_rss()
+    return report
+
+
+def summarize(latencies):
+    """
+    Returns the mean, p50 and p99 of `latencies` in milliseconds.
+    """
+    ordered = sorted(latencies)
+    if not ordered:
+        return {}
+
+    def percentile(p):
+        return 1000 * ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    return {
+        "mean_ms": 1000 * sum(ordered) / len(ordered),
+        "p50_ms": percentile(50),
+        "p99_ms": percentile(99),
+    }
+
+
+def compare(before, after, force=False):
+    """
+    Print every numeric measurement of two reports side by side, with the
+    ratio after / before. Reports run with different settings aren't
+    comparable, so unless `force` is set this lists the differences and
+    returns 1 instead.
+    """
+    with open(before) as f:
+        old = flatten(json.load(f))
+    with open(after) as f:
+        new = flatten(json.load(f))
+
+    settings = [key for key in old.keys() | new.keys() if is_setting(key)]
+    differences = [key for key in sorted(settings) if old.get(key) != new.get(key)]
+    for key in differences:
+        print(f"{key} differs: {old.get(key)!r} != {new.get(key)!r}", file=sys.stderr)
+    if differences and not force:
+        print("reports were run with different settings (use --force to compare anyway)", file=sys.stderr)
+        return 1
+
+    for key in old:
+        if is_setting(key) or key not in new:
+            continue
+        if isinstance(old[key], (int, float)) and not isinstance(old[key], bool):
+            ratio = f"{new[key] / old[key]:.2f}x" if old[key] else "-"
+            print(f"{key:45} {old[key]:>14.4f} {new[key]:>14.4f} {ratio:>9}")
+
+
+def is_setting(key):
+    return key in SETTINGS or key.endswith(".budget")
+
+
+def flatten(report, prefix=""):
+    flat = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+from collections import OrderedDict
+
+
+class LRUCache():
+    """
+    Least-recently-used cache bounded by a budget.
+
+    Each value is charged `sizeof(value)` against `budget` (by default 1, so
+    the budget is a number of entries); the least recently used entries are
+    evicted until the cache fits again.
+    """
+
+    def __init__(self, budget, sizeof=None):
+        self.budget = budget
+        self.sizeof = sizeof or (lambda value: 1)
+        self.entries = OrderedDict()
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        try:
+            value, size = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key, default=None):
+        """
+        Like get, but without touching the recency order or the counters.
+        """
+        entry = self.entries.get(key)
+        return default if entry is None else entry[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        if key in self.entries:
+            self.used -= self.entries.pop(key)[1]
+
+        # Values larger than the whole budget are not kept at all
+        if size > self.budget:
+            return value
+        self.entries[key] = (value, size)
+        self.used += size
+        while self.used > self.budget:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.used -= evicted
+            self.evictions += 1
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.used = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "used": self.used,
+            "budget": self.budget,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -1,66 +1,214 @@
-import csv
+import argparse
+import json
+import multiprocessing
+import os
 import sys
 
+from cache import LRUCache
+from graph import Graph, MoviesView, NamesView, PeopleView
+from sqlgraph import SQLiteGraph
+from search import BFSTree, ShortestPathDAG, bfs_levels, neighbors_in, CostarIndex, LandmarkIndex, TrigramIndex
 from util import Node, StackFrontier, QueueFrontier
 
+# Memory budget in bytes for cached BFS trees, and how many queries must touch
+# a person before a full BFS tree is built for them
+TREE_CACHE_BUDGET = 64 * 2 ** 20
+TREE_THRESHOLD = 3
+
+# Memory budget in bytes for neighbors_for_person results
+NEIGHBOR_CACHE_BUDGET = 16 * 2 ** 20
+
+# Largest gap between the landmark bounds of a query for which shortest_path
+# still prunes with them
+LANDMARK_SLACK = 1
+
+# Number of year ranges whose movie masks are kept for filtered searches
+YEAR_MASK_CACHE = 32
+
+# Integer-indexed CSR store holding the whole dataset
+graph = Graph()
+
 # Maps names to a set of corresponding person_ids
-names = {}
+names = NamesView(graph)
 
 # Maps person_ids to a dictionary of: name, birth, movies (a set of movie_ids)
-people = {}
+people = PeopleView(graph)
 
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
-movies = {}
+movies = MoviesView(graph)
+
+# Full BFS trees of the people that appear most in queries, and how often
+# recent query endpoints were seen
+trees = LRUCache(TREE_CACHE_BUDGET, sizeof=BFSTree.nbytes)
+tree_candidates = LRUCache(100000)
+
+# Optional LandmarkIndex, see build_landmarks
+landmarks = None
+
+# Results of neighbors_for_person, charged their full size in bytes (see
+# pairs_nbytes), and how many pairs were built fresh or served again from the
+# cache. Only callers of neighbors_for_person use it: the searches expand
+# people through the graph itself, or the CostarIndex of materialize_costars.
+neighbor_cache = LRUCache(NEIGHBOR_CACHE_BUDGET, sizeof=lambda pairs: pairs_nbytes(pairs))
+neighbor_pairs = {"built": 0, "reused": 0}
+
+# Optional CostarIndex replacing the movie-by-movie expansion in searches,
+# see materialize_costars
+costars = None
+
+# Optional TrigramIndex for typo-tolerant search_names, see build_trigrams
+name_trigrams = None
 
+# Bytearrays flagging the movies released in each recently used year range
+year_masks = LRUCache(YEAR_MASK_CACHE)
 
-def load_data(directory):
+# Number of people expanded by searches since the data was loaded
+search_stats = {"expanded": 0}
+
+
+def load_data(directory, backend="memory", snapshot=True):
     """
     Load data from CSV files into memory.
+
+    With backend="sqlite" the CSV files are imported once into an indexed
+    SQLite database next to them, and the data is read from it on demand.
+    `snapshot` controls the binary snapshot of the in-memory backend.
+    """
+    global graph, landmarks, costars, name_trigrams
+    if backend == "sqlite":
+        graph = SQLiteGraph(directory)
+    else:
+        if not isinstance(graph, Graph):
+            graph = Graph()
+        graph.load(directory, snapshot)
+    names.graph = people.graph = movies.graph = graph
+    trees.clear()
+    tree_candidates.clear()
+    neighbor_cache.clear()
+    year_masks.clear()
+    search_stats["expanded"] = 0
+    landmarks = None
+    costars = None
+    name_trigrams = None
+
+
+def materialize_costars():
+    """
+    Builds the deduplicated person -> person co-star adjacency and makes
+    searches use it. Only worth it on datasets small enough to hold it.
     """
-    # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
-
-    # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
-
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    global costars
+    costars = CostarIndex(graph)
+    return costars
+
+
+def cache_stats():
+    """
+    Returns the counters of every cache and optional index in use.
+    """
+    stats = {
+        "search": dict(search_stats),
+        "trees": trees.stats(),
+        "year_masks": year_masks.stats(),
+        "neighbors": dict(neighbor_cache.stats(), pairs=dict(neighbor_pairs)),
+    }
+    if costars is not None:
+        stats["costars"] = costars.stats()
+    return stats
+
+
+def build_landmarks(k):
+    """
+    Builds a LandmarkIndex over the `k` highest-degree people, used by
+    estimate_degrees and to prune shortest_path.
+    """
+    global landmarks
+    landmarks = LandmarkIndex(graph, k) if k > 0 else None
+    return landmarks
+
+
+def component_sizes():
+    """
+    Returns the sizes of the connected components of the graph, largest first.
+    """
+    return sorted(graph.component_sizes, reverse=True)
+
+
+def connected(source, target):
+    """
+    Returns whether two person_ids are connected by some path.
+    """
+    return graph.connected(graph.person_index[source], graph.person_index[target])
+
+
+def estimate_degrees(source, target):
+    """
+    Returns (lower, upper) bounds on the degrees of separation between two
+    person_ids from the landmark index. `upper` is None when no landmark
+    reaches both people.
+    """
+    if landmarks is None:
+        raise RuntimeError("no landmark index, call build_landmarks first")
+    if source == target:
+        return 0, 0
+    return landmarks.bounds(graph.person_index[source], graph.person_index[target])
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(description="Degrees of separation between actors.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument(
+        "--batch", metavar="FILE",
+        help="answer tab-separated source/target pairs from FILE ('-' for stdin)"
+    )
+    parser.add_argument(
+        "--backend", choices=("memory", "sqlite"), default="memory",
+        help="keep the graph in memory, or read it lazily from SQLite "
+             "(which never builds cached BFS trees)"
+    )
+    parser.add_argument(
+        "--years", type=parse_years, metavar="FIRST-LAST",
+        help="only connect people through movies from these years (either end may be left out)"
+    )
+    parser.add_argument(
+        "--landmarks", type=int, default=0, metavar="K",
+        help="build a landmark index over the K highest-degree people"
+    )
+    parser.add_argument(
+        "--stats", action="store_true",
+        help="report load timings, row counts and peak memory"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=os.cpu_count(),
+        help="worker processes used in batch mode"
+    )
+    args = parser.parse_args()
+
+    # Batch results go to stdout, so progress messages move to stderr
+    log = sys.stderr if args.batch else sys.stdout
 
     # Load data from files into memory
-    print("Loading data...")
-    load_data(directory)
-    print("Data loaded.")
+    print("Loading data...", file=log)
+    load_data(args.directory, args.backend)
+    print("Data loaded.", file=log)
+    if args.stats and graph.load_stats is not None:
+        print(graph.load_stats.report(), file=log)
+
+    if args.landmarks:
+        index = build_landmarks(args.landmarks)
+        print(
+            f"Landmark index: {index.k} landmarks, {index.nbytes()} bytes, "
+            f"built in {index.build_seconds:.2f}s.",
+            file=log
+        )
+
+    if args.batch:
+        if args.batch == "-":
+            run_batch(sys.stdin, args.directory, args.jobs, args.backend, args.years)
+        else:
+            with open(args.batch, encoding="utf-8") as f:
+                run_batch(f, args.directory, args.jobs, args.backend, args.years)
+        return
 
     source = person_id_for_name(input("Name: "))
     if source is None:
@@ -69,7 +217,7 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path = shortest_path(source, target, args.years)
 
     if path is None:
         print("Not connected.")
@@ -84,42 +232,337 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def parse_years(text):
+    """
+    Parses "FIRST-LAST", "FIRST-", "-LAST" or a single "YEAR" into a
+    (first, last) year range for shortest_path.
+    """
+    first, dash, last = text.partition("-")
+    try:
+        first = int(first) if first else None
+        last = int(last) if last else (None if dash else first)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid year range: {text}")
+    return first, last
+
+
+def run_batch(lines, directory, jobs, backend="memory", year_range=None, output=sys.stdout):
+    """
+    Answers one query per line of `lines`, each a source and a target
+    (names or IMDB ids) separated by a tab, writing one JSON object per
+    query to `output` as soon as it is answered. `year_range` restricts
+    every query as in shortest_path.
+
+    Queries are spread over `jobs` processes. Forked workers share the
+    already loaded graph instead of reading the dataset again; where fork is
+    unavailable each worker opens the snapshot (or SQLite database), which
+    maps the same pages.
+    """
+    tasks = ((i, line.rstrip("\n"), year_range) for i, line in enumerate(lines))
+    if jobs <= 1:
+        for result in map(answer_query, tasks):
+            output.write(result + "\n")
+            output.flush()
+        return
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        pool = multiprocessing.get_context("fork").Pool(jobs)
+    else:
+        pool = multiprocessing.Pool(jobs, initializer=load_data, initargs=(directory, backend))
+    with pool:
+        for result in pool.imap_unordered(answer_query, tasks, chunksize=16):
+            output.write(result + "\n")
+            output.flush()
+
+
+def answer_query(task):
+    """
+    Answers one batch query line, returning the result as a JSON string.
+    """
+    line, text, year_range = task
+    result = {"line": line + 1}
+    fields = text.split("\t")
+    if len(fields) != 2:
+        result["error"] = "expected a source and a target separated by a tab"
+        return json.dumps(result)
+
+    source, error = resolve_person(fields[0])
+    if error is None:
+        target, error = resolve_person(fields[1])
+    if error is not None:
+        result["error"] = error
+        return json.dumps(result)
+
+    result["source"] = source
+    result["target"] = target
+    path = shortest_path(source, target, year_range)
+    result["degrees"] = None if path is None else len(path)
+    result["path"] = path
+    return json.dumps(result)
+
+
+def resolve_person(text):
+    """
+    Non-interactive counterpart of person_id_for_name: accepts an IMDB id or
+    an unambiguous name, returning (person_id, None) or (None, error).
+    """
+    text = text.strip()
+    if text in people:
+        return text, None
+    person_ids = list(names.get(text.lower(), set()))
+    if len(person_ids) == 0:
+        return None, f"person not found: {text}"
+    elif len(person_ids) > 1:
+        return None, f"ambiguous name: {text} ({', '.join(sorted(person_ids))})"
+    return person_ids[0], None
+
+
+def shortest_path(source, target, year_range=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
+    With `year_range`, a (first, last) pair of years where either end may be
+    None, only movies released in that range are used.
+
     If no possible path, returns None.
     """
     # We check if the target is the same as the source, just in case the person testing the code tries to see what happens 
     if source == target:
             return []
-    
-    # As we'd like to find the shortest path, we should use BFS (Our frontier must be a queue)
-    queue = []
-
-    # In our frontier we'll add not only the the node to explore, but the path we've taken to reach that node.
-    # By doing this we won't have to go back our path looking for each node's parent after finding the solution
-    queue.append((source, [(None, source)]))
-
-    explored = set()
-
-    # If we haven't found a solution and our frontier is empty, than means such path doesn't exist.
-    while queue:
-        NodeToExplore, path = queue.pop(0) 
-        explored.add(NodeToExplore)
-    
-    # Looking for the solution in the adjacent nodes, by doing this we won't waste time looking for other nodes in our frontier
-    # when the solution is already there.
-        for movie, actor in neighbors_for_person(NodeToExplore): 
-            if actor not in explored:
-                if actor == target: 
-                    return (path + [(movie, actor)])[1:] # We don't consider the first element (None, source) of the path
-                else:
-                    queue.append((actor, path + [(movie, actor)]))
+
+    # The search itself runs on the dense integer ids of the graph
+    source = graph.person_index[source]
+    target = graph.person_index[target]
+
+    # People in different connected components can be rejected right away,
+    # instead of exhausting the source's whole component
+    if not graph.connected(source, target):
+        return None
+
+    # Cached trees, co-stars and landmark bounds describe the unfiltered
+    # graph, so a year-restricted search runs on its own
+    if year_range is not None:
+        path = bidirectional_search(source, target, year_mask(*year_range))
+        if path is None:
+            return None
+        return [(graph.movie_ids[m], graph.person_ids[p]) for m, p in path]
+
+    # A cached BFS tree rooted at either end answers the query by walking its
+    # predecessors, since the graph is undirected
+    tree = tree_for(source, target)
+    if tree is None:
+        path = bidirectional_search(source, target)
+    elif not tree.reaches(source if tree.root == target else target):
+        path = None
+    elif tree.root == source:
+        path = tree.path_from_root(target)
+    else:
+        path = tree.path_to_root(source)
+
+    if path is None:
+        return None
+    return [(graph.movie_ids[m], graph.person_ids[p]) for m, p in path]
+
+
+def shortest_path_dag(source, target, year_range=None):
+    """
+    Runs one BFS from `source` and returns the ShortestPathDAG of every
+    shortest path to `target`, for count_shortest_paths and
+    all_shortest_paths. `year_range` is as in shortest_path.
+    """
+    source = graph.person_index[source]
+    target = graph.person_index[target]
+    mask = None if year_range is None else year_mask(*year_range)
+
+    # People in different components have no paths at all, so don't
+    # BFS through the whole of the source's component to find that out
+    reachable = graph.connected(source, target)
+    return ShortestPathDAG(graph, source, target, mask, reachable)
+
+
+def count_shortest_paths(dag):
+    """
+    Returns how many distinct shortest paths a shortest_path_dag holds.
+    """
+    return dag.count()
+
+
+def all_shortest_paths(dag, limit=None):
+    """
+    Lazily yields up to `limit` shortest paths of a shortest_path_dag, each
+    a list of (movie_id, person_id) pairs like shortest_path returns.
+    """
+    for path in dag.paths(limit):
+        yield [(graph.movie_ids[m], graph.person_ids[p]) for m, p in path]
+
+
+def tree_for(source, target):
+    """
+    Returns a cached BFSTree rooted at `source` or `target`, building one
+    for either of them once they have been queried TREE_THRESHOLD times.
+    Returns None if no tree is available.
+
+    The SQLite backend never builds trees: a full-component BFS through SQL
+    takes seconds and would pull every row of the component into its page
+    cache, so its memory would no longer track the working set.
+    """
+    if isinstance(graph, SQLiteGraph):
+        return None
+
+    for person in (source, target):
+        if person in trees:
+            return trees.get(person)
+    trees.misses += 1
+
+    for person in (source, target):
+        count = tree_candidates.peek(person, 0) + 1
+        if count >= TREE_THRESHOLD:
+            tree_candidates.put(person, 0)
+            return trees.put(person, BFSTree(graph, person))
+        tree_candidates.put(person, count)
+    return None
+
+
+def year_mask(first, last):
+    """
+    Returns a bytearray flagging the movies released from `first` to `last`,
+    looked up in the year index and cached per range.
+    """
+    mask = year_masks.get((first, last))
+    if mask is None:
+        mask = bytearray(graph.movie_count)
+        for m in graph.movies_in_years(first, last):
+            mask[m] = 1
+        year_masks.put((first, last), mask)
+    return mask
+
+
+def bidirectional_search(source, target, movie_mask=None):
+    """
+    Returns the shortest list of (movie, person) dense id pairs connecting
+    `source` to `target`, or None if they are not connected. With
+    `movie_mask`, only movies flagged in it are used.
+    """
+    # We run a bidirectional BFS: one search grows from the source, another from
+    # the target, and the path is stitched together where they meet. Each side
+    # maps every person it reached to its search Node, whose parent chain is
+    # only walked once the searches have met.
+    forward = {source: Node(source, None, None)}
+    backward = {target: Node(target, None, None)}
+    forward_frontier = QueueFrontier()
+    backward_frontier = QueueFrontier()
+    forward_frontier.add(forward[source])
+    backward_frontier.add(backward[target])
+    forward_depth = backward_depth = 0
+
+    # With a landmark index, the distance through the best landmark is an
+    # upper bound on the answer, and people whose depth plus their landmark
+    # lower bound to the other end exceeds it cannot lie on a shortest path.
+    # Checking costs more than it saves unless the bounds are tight, so
+    # loose bounds turn pruning off for the query.
+    upper = None
+    if landmarks is not None and movie_mask is None:
+        lower, upper = landmarks.bounds(source, target)
+        if upper is not None and upper - lower > LANDMARK_SLACK:
+            upper = None
+    forward_goal = backward_goal = None
+    if upper is not None:
+        forward_goal, backward_goal = landmarks.goal(target), landmarks.goal(source)
+    forward_pruned, backward_pruned = set(), set()
+
+    if movie_mask is not None:
+        neighbors = lambda person: neighbors_in(graph, person, movie_mask)
+    elif costars is not None:
+        neighbors = costars.neighbors
+    else:
+        neighbors = graph.neighbors
+
+    # If either frontier runs out before meeting the other, no path exists
+    while not forward_frontier.empty() and not backward_frontier.empty():
+
+        # Expanding the smaller side keeps the number of explored people low
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_depth += 1
+            prune = landmark_pruner(forward_depth, forward_goal, upper, forward_pruned)
+            meeting = expand_frontier(forward_frontier, forward, backward, neighbors, prune)
+        else:
+            backward_depth += 1
+            prune = landmark_pruner(backward_depth, backward_goal, upper, backward_pruned)
+            meeting = expand_frontier(backward_frontier, backward, forward, neighbors, prune)
+
+        if meeting is not None:
+            return join_paths(forward[meeting], backward[meeting])
+    return None
+
+
+def landmark_pruner(depth, goal, upper, pruned):
+    """
+    Returns a function telling whether a person found at `depth` can be
+    skipped because the landmarks prove any path from them to `goal` (see
+    LandmarkIndex.goal) longer than `upper`, or None when no person can be
+    pruned at this depth (or `goal` is None, for no pruning at all).
+
+    A person pruned at one depth would be pruned at any later one too, so
+    they are remembered in the set `pruned` and never checked again.
+    """
+    if goal is None or depth + goal[2] <= upper:
+        return None
+
+    def prune(person):
+        if person in pruned:
+            return True
+        if depth + landmarks.lower(person, goal) > upper:
+            pruned.add(person)
+            return True
+        return False
+    return prune
+
+
+def expand_frontier(frontier, reached, other, neighbors, prune=None):
+    """
+    Expands one whole BFS level of `frontier` using the `neighbors` function,
+    adding a Node to `reached` for each new person found that `prune` does
+    not reject.
+
+    Returns the first person that was already reached by the `other` search,
+    or None if the searches did not meet. Since whole levels are expanded at
+    a time, the first meeting is on a shortest path.
+    """
+    for _ in range(len(frontier)):
+        node = frontier.remove()
+        search_stats["expanded"] += 1
+        for movie, actor in neighbors(node.state):
+            if actor not in reached:
+                if prune is not None and prune(actor):
+                    continue
+                child = Node(actor, node, movie)
+                reached[actor] = child
+                if actor in other:
+                    return actor
+                frontier.add(child)
     return None
 
 
+def join_paths(forward_node, backward_node):
+    """
+    Builds the (movie, person) path through the meeting point of the two
+    searches from the parent chains of its forward and backward Nodes.
+    """
+    path = []
+    node = forward_node
+    while node.parent is not None:
+        path.append((node.action, node.state))
+        node = node.parent
+    path.reverse()
+
+    node = backward_node
+    while node.parent is not None:
+        path.append((node.action, node.parent.state))
+        node = node.parent
+    return path
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
@@ -146,17 +589,86 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def neighborhood(person_id, max_degrees=None):
+    """
+    Yields (degrees, person_id) for everyone within `max_degrees` degrees of
+    separation of `person_id` (the whole component by default), closest
+    first, as the level-synchronous BFS reaches them.
+    """
+    root = graph.person_index[person_id]
+    for depth, level in enumerate(bfs_levels(graph, root, max_degrees)):
+        for p in level:
+            yield depth, graph.person_ids[p]
+
+
+def separation_histogram(person_id, max_degrees=None):
+    """
+    Returns a list whose i-th entry is the number of people exactly i
+    degrees of separation away from `person_id`, up to `max_degrees`.
+    """
+    root = graph.person_index[person_id]
+    return [len(level) for level in bfs_levels(graph, root, max_degrees)]
+
+
+def search_names(prefix, limit=10, fuzzy=False):
+    """
+    Returns up to `limit` person_ids whose name starts with `prefix`
+    (ignoring case), exact matches first and then by number of movies,
+    ranked across all the matches.
+
+    With `fuzzy` and a trigram index (see build_trigrams), remaining slots
+    are filled with the names most similar to `prefix`, to tolerate typos.
+    """
+    prefix = prefix.lower()
+    found = graph.names_by_movies(prefix, limit)
+
+    if fuzzy and name_trigrams is not None and len(found) < limit:
+        seen = set(found)
+        for p in name_trigrams.search(prefix, limit):
+            if p not in seen and len(found) < limit:
+                found.append(p)
+    return [graph.person_ids[p] for p in found]
+
+
+def build_trigrams():
+    """
+    Builds the trigram index used by search_names(..., fuzzy=True).
+    """
+    global name_trigrams
+    name_trigrams = TrigramIndex(graph)
+    return name_trigrams
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
+
+    Results are cached, so the returned set is a shared frozenset.
+    """
+    p = graph.person_index[person_id]
+    neighbors = neighbor_cache.get(p)
+    if neighbors is not None:
+        neighbor_pairs["reused"] += len(neighbors)
+        return neighbors
+
+    neighbors = frozenset(
+        (graph.movie_ids[m], graph.person_ids[q])
+        for m, q in graph.neighbors(p)
+    )
+    neighbor_pairs["built"] += len(neighbors)
+    return neighbor_cache.put(p, neighbors)
+
+
+def pairs_nbytes(pairs):
+    """
+    Returns the bytes held by a set of (movie_id, person_id) pairs: the set,
+    its tuples and their strings, counted as if nothing else shared them.
     """
-    movie_ids = people[person_id]["movies"]
-    neighbors = set()
-    for movie_id in movie_ids:
-        for person_id in movies[movie_id]["stars"]:
-            neighbors.add((movie_id, person_id))
-    return neighbors
+    return sys.getsizeof(pairs) + sum(
+        sys.getsizeof(pair) + sys.getsizeof(pair[0]) + sys.getsizeof(pair[1])
+        for pair in pairs
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,816 @@
+import csv
+import io
+import json
+import mmap
+import os
+import sys
+import time
+
+from array import array
+from bisect import bisect_left, bisect_right
+from heapq import heappop, heappush
+from collections.abc import Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Binary snapshot written next to the CSV files after a successful load
+SNAPSHOT = "degrees.snapshot"
+SNAPSHOT_MAGIC = b"DEGREES1"
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+
+class Graph():
+    """
+    Compact person/movie graph.
+
+    IMDB ids are interned to dense integers (0..n-1) and the two
+    relations are stored in CSR form: the movies of person `p` are
+    `person_movies[person_offsets[p]:person_offsets[p + 1]]`, and the
+    stars of movie `m` are `movie_stars[movie_offsets[m]:movie_offsets[m + 1]]`.
+
+    The integer arrays are written to a snapshot and mapped back in without
+    parsing. The string columns are stored there as StringTables, but they
+    are decoded into plain lists once on load, because ids and names are
+    read far too often to decode them again on every access.
+    """
+
+    # Fields saved in a snapshot, by kind
+    ARRAYS = (
+        "person_offsets", "person_movies", "movie_offsets", "movie_stars",
+        "person_order", "movie_order", "name_order",
+        "person_components", "component_sizes",
+        "year_order", "year_keys",
+    )
+    STRINGS = (
+        "person_ids", "person_names", "person_births",
+        "movie_ids", "movie_titles", "movie_years",
+    )
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        # Per-person and per-movie attributes, indexed by the dense ids
+        for name in self.STRINGS:
+            setattr(self, name, [])
+
+        # CSR adjacency in both directions, plus the dense ids sorted by IMDB
+        # id and by lowercase name, which back the lookup indexes
+        for name in self.ARRAYS:
+            setattr(self, name, array("i"))
+        self.person_offsets = array("i", [0])
+        self.movie_offsets = array("i", [0])
+
+        self.snapshot = None
+        self.load_stats = None
+        self.index()
+
+    def index(self):
+        """
+        Rebuild the lookup mappings over the current arrays: IMDB id -> dense
+        id, and lowercase name -> list of dense person ids.
+        """
+        self.person_index = SortedIndex(self.person_ids, self.person_order)
+        self.movie_index = SortedIndex(self.movie_ids, self.movie_order)
+        self.name_index = SortedIndex(
+            self.person_names, self.name_order, unique=False, fold=str.lower
+        )
+
+        # Built on the first names_by_movies call
+        self.name_ranking = None
+
+    def load(self, directory, snapshot=True, workers=None):
+        """
+        Load people.csv, movies.csv and stars.csv from `directory`,
+        replacing whatever the graph held before.
+
+        With `snapshot`, a snapshot matching the current CSV files is mapped
+        in instead of parsing them, and a fresh one is written otherwise.
+        Timings, row counts and peak memory end up in `load_stats`.
+        """
+        stats = LoadStats()
+        path = os.path.join(directory, SNAPSHOT)
+        stamps = source_stamps(directory)
+        if snapshot:
+            with stats.phase("snapshot"):
+                mapped = self.open(path, stamps)
+            if mapped:
+                self.load_stats = stats.finish()
+                return
+
+        self.parse(directory, workers, stats)
+        if snapshot:
+            with stats.phase("save"):
+                try:
+                    self.save(path, stamps)
+                except OSError:
+                    # A read-only dataset directory just means no snapshot
+                    pass
+        self.load_stats = stats.finish()
+
+    def parse(self, directory, workers=None, stats=None):
+        """
+        Build the graph from the CSV files in `directory`.
+
+        The files are parsed concurrently by `workers` processes (one per CPU
+        by default), people.csv and movies.csv whole and stars.csv in byte
+        ranges, then merged here.
+        """
+        stats = stats or LoadStats()
+        self.clear()
+        workers = workers or os.cpu_count() or 1
+
+        with stats.phase("parse"):
+            tasks = [
+                (f"{directory}/people.csv", ("id", "name", "birth"), None),
+                (f"{directory}/movies.csv", ("id", "title", "year"), None),
+            ]
+            stars = f"{directory}/stars.csv"
+            for chunk in byte_ranges(stars, max(1, workers - 2)):
+                tasks.append((stars, ("person_id", "movie_id"), chunk))
+
+            if workers > 1:
+                with ProcessPoolExecutor(workers) as executor:
+                    results = list(executor.map(read_columns, *zip(*tasks)))
+            else:
+                results = [read_columns(*task) for task in tasks]
+            (person_ids, person_names, person_births), \
+                (movie_ids, movie_titles, movie_years) = results[:2]
+
+        stats.rows["people"] = len(person_ids)
+        stats.rows["movies"] = len(movie_ids)
+        stats.rows["stars"] = sum(len(chunk[0]) for chunk in results[2:])
+
+        # Each star is kept as a single integer `person * M + movie`, so a set
+        # removes duplicate rows and sorting groups the pairs by person
+        with stats.phase("merge"):
+            person_index = {id: p for p, id in enumerate(person_ids)}
+            movie_index = {id: m for m, id in enumerate(movie_ids)}
+            M = len(movie_ids)
+            pairs = set()
+            for chunk_people, chunk_movies in results[2:]:
+                for person_id, movie_id in zip(chunk_people, chunk_movies):
+                    p = person_index.get(person_id)
+                    m = movie_index.get(movie_id)
+                    if p is not None and m is not None:
+                        pairs.add(p * M + m)
+            del results, person_index, movie_index
+            pairs = sorted(pairs)
+        stats.rows["stars_kept"] = len(pairs)
+
+        with stats.phase("build"):
+            self.build(len(person_ids), M, pairs)
+            del pairs
+        with stats.phase("components"):
+            self.label_components()
+
+        with stats.phase("index"):
+            self.person_order = sorted_order(person_ids)
+            self.movie_order = sorted_order(movie_ids)
+            years = [parse_year(year) for year in movie_years]
+            self.year_order = sorted_order(years)
+            self.year_keys = array("i", (years[m] for m in self.year_order))
+            self.name_order = sorted_order([name.lower() for name in person_names])
+            self.person_ids = person_ids
+            self.person_names = person_names
+            self.person_births = person_births
+            self.movie_ids = movie_ids
+            self.movie_titles = movie_titles
+            self.movie_years = movie_years
+            self.index()
+
+    def build(self, P, M, pairs):
+        """
+        Build both CSR relations from `pairs`, a sorted sequence of
+        unique `person * M + movie` codes.
+        """
+        # Person -> movies: the pairs are already ordered by person
+        self.person_movies = array("i", (code % M for code in pairs))
+        counts = [0] * P
+        for code in pairs:
+            counts[code // M] += 1
+        self.person_offsets = offsets_from_counts(counts)
+
+        # Movie -> stars: counting sort of the same pairs by movie
+        counts = [0] * M
+        for m in self.person_movies:
+            counts[m] += 1
+        self.movie_offsets = offsets_from_counts(counts)
+        cursor = array("i", self.movie_offsets[:-1])
+        self.movie_stars = array("i", [0]) * len(pairs)
+        for code in pairs:
+            m = code % M
+            self.movie_stars[cursor[m]] = code // M
+            cursor[m] += 1
+
+    def label_components(self):
+        """
+        Assign every person the id of their connected component, merging the
+        stars of each movie with union-find, and count component sizes.
+        """
+        P = len(self.person_offsets) - 1
+        parent = array("i", range(P))
+
+        def find(p):
+            while parent[p] != p:
+                parent[p] = parent[parent[p]]
+                p = parent[p]
+            return p
+
+        for m in range(len(self.movie_offsets) - 1):
+            stars = self.stars_of(m)
+            if not stars:
+                continue
+            root = find(stars[0])
+            for p in stars[1:]:
+                other = find(p)
+                if other != root:
+                    parent[other] = root
+
+        # Relabel the union-find roots as dense component ids
+        labels = {}
+        self.person_components = array("i", [0]) * P
+        sizes = []
+        for p in range(P):
+            root = find(p)
+            if root not in labels:
+                labels[root] = len(sizes)
+                sizes.append(0)
+            self.person_components[p] = labels[root]
+            sizes[labels[root]] += 1
+        self.component_sizes = array("i", sizes)
+
+    def connected(self, p, q):
+        return self.person_components[p] == self.person_components[q]
+
+    def movies_in_years(self, first, last):
+        """
+        Returns the movies released from year `first` to `last` inclusive
+        (None for an open end), by binary search over the year-sorted movies.
+        """
+        lo = 0 if first is None else bisect_left(self.year_keys, first)
+        hi = len(self.year_keys) if last is None else bisect_right(self.year_keys, last)
+        return self.year_order[lo:hi]
+
+    def save(self, path, stamps):
+        """
+        Write the graph to a snapshot file at `path`, tagged with the `stamps`
+        of the CSV files it was built from.
+
+        The file is a magic string, a JSON header describing each section, and
+        the raw section bytes, each aligned to 8 bytes.
+        """
+        buffers = {}
+        for name in self.ARRAYS:
+            buffers[name] = memoryview(getattr(self, name))
+        for name in self.STRINGS:
+            table = StringTable.from_strings(getattr(self, name))
+            buffers[f"{name}.offsets"] = memoryview(table.offsets)
+            buffers[f"{name}.blob"] = memoryview(table.blob)
+
+        sections = {}
+        offset = 0
+        for name, buffer in buffers.items():
+            sections[name] = [offset, buffer.format, len(buffer)]
+            offset = align(offset + buffer.nbytes)
+        header = json.dumps({"sources": stamps, "sections": sections}).encode()
+
+        # Written under a temporary name so a crash never leaves a torn snapshot
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                f.write(SNAPSHOT_MAGIC)
+                f.write(len(header).to_bytes(8, "little"))
+                f.write(header)
+                f.write(bytes(align(16 + len(header)) - 16 - len(header)))
+                for buffer in buffers.values():
+                    f.write(buffer)
+                    f.write(bytes(align(buffer.nbytes) - buffer.nbytes))
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    def open(self, path, stamps):
+        """
+        Map the snapshot at `path` into the graph, if it exists and was built
+        from CSV files with the given `stamps`.
+
+        Returns whether the snapshot was used.
+        """
+        try:
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+
+        view = memoryview(data)
+        try:
+            if view[:8] != SNAPSHOT_MAGIC:
+                return False
+            length = int.from_bytes(view[8:16], "little")
+            header = json.loads(bytes(view[16:16 + length]))
+        except ValueError:
+            return False
+        if header["sources"] != stamps:
+            return False
+
+        base = align(16 + length)
+        sections = header["sections"]
+
+        def section(name):
+            offset, fmt, count = sections[name]
+            size = array(fmt).itemsize
+            return view[base + offset:base + offset + count * size].cast(fmt)
+
+        try:
+            for name in self.ARRAYS:
+                setattr(self, name, section(name))
+            for name in self.STRINGS:
+                setattr(self, name, StringTable(
+                    section(f"{name}.offsets"), section(f"{name}.blob")
+                ).decode())
+        except KeyError:
+            # Written by an older version with fewer sections
+            self.clear()
+            return False
+
+        self.snapshot = data
+        self.index()
+        return True
+
+    def names_by_movies(self, prefix, limit):
+        """
+        Returns up to `limit` dense person ids whose lowercase name starts
+        with `prefix`: exact matches first, then the people with the most
+        movies, ties in name order.
+
+        The matches are a range of `name_order`, and a RangeTop over the
+        number of movies of each person in that order picks the best of
+        them without looking at the rest.
+        """
+        if self.name_ranking is None:
+            offsets = self.person_offsets
+            self.name_ranking = RangeTop(array("i", (
+                offsets[p + 1] - offsets[p] for p in self.name_order
+            )))
+        lo, exact, hi = self.name_index.prefix_bounds(prefix)
+        positions = self.name_ranking.top(lo, exact, limit)
+        positions += self.name_ranking.top(exact, hi, limit - len(positions))
+        return [self.name_order[i] for i in positions]
+
+    @property
+    def person_count(self):
+        return len(self.person_ids)
+
+    @property
+    def movie_count(self):
+        return len(self.movie_ids)
+
+    def movies_of(self, p):
+        return self.person_movies[self.person_offsets[p]:self.person_offsets[p + 1]]
+
+    def stars_of(self, m):
+        return self.movie_stars[self.movie_offsets[m]:self.movie_offsets[m + 1]]
+
+    def neighbors(self, p):
+        """
+        Yield (movie, person) pairs of dense ids for everyone who starred
+        with person `p`, including `p` itself.
+        """
+        person_movies, movie_stars = self.person_movies, self.movie_stars
+        movie_offsets = self.movie_offsets
+        for i in range(self.person_offsets[p], self.person_offsets[p + 1]):
+            m = person_movies[i]
+            for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                yield m, movie_stars[j]
+
+    def nbytes(self):
+        """
+        Approximate size in bytes of the CSR arrays.
+        """
+        return sum(
+            memoryview(getattr(self, name)).nbytes for name in (
+                "person_offsets", "person_movies",
+                "movie_offsets", "movie_stars"
+            )
+        )
+
+
+def read_columns(path, columns, chunk=None):
+    """
+    Parse the named `columns` of the CSV file at `path` with a plain
+    csv.reader, returning one list of values per column.
+
+    With `chunk`, a (start, end) byte range from byte_ranges, only the rows
+    in that range are read.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        header = next(csv.reader([f.readline()]))
+    positions = [header.index(column) for column in columns]
+    values = [[] for _ in columns]
+    appends = [(i, column.append) for i, column in zip(positions, values)]
+
+    with open(path, "rb") as f:
+        if chunk is None:
+            f.readline()
+            data = f.read()
+        else:
+            f.seek(chunk[0])
+            data = f.read(chunk[1] - chunk[0])
+    for row in csv.reader(io.StringIO(data.decode("utf-8"), newline="")):
+        if row:
+            for i, append in appends:
+                append(row[i])
+    return values
+
+
+def byte_ranges(path, chunks):
+    """
+    Split the rows of the CSV file at `path` (after its header) into about
+    `chunks` byte ranges that start and end on line boundaries. Only valid
+    for files without quoted newlines, such as stars.csv.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        f.readline()
+        bounds = [f.tell()]
+        step = max(1, (size - bounds[0]) // chunks)
+        for i in range(1, chunks):
+            f.seek(max(bounds[-1], bounds[0] + i * step))
+            f.readline()
+            if f.tell() >= size:
+                break
+            bounds.append(f.tell())
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+class LoadStats():
+    """
+    Wall-clock time per load phase, row counts and peak memory of a load.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.rows = {}
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    def finish(self):
+        self.total = time.perf_counter() - self.start
+        self.peak_rss = peak_rss()
+        return self
+
+    def report(self):
+        lines = [f"Loaded in {self.total:.2f}s"]
+        for name, seconds in self.phases.items():
+            lines.append(f"  {name}: {seconds:.2f}s")
+        for name, count in self.rows.items():
+            lines.append(f"  {name} rows: {count}")
+        if self.peak_rss is not None:
+            lines.append(f"  peak memory: {self.peak_rss / 2 ** 20:.1f} MB")
+        return "\n".join(lines)
+
+
+def peak_rss():
+    """
+    Returns the peak resident memory in bytes of this process and its
+    finished children, or None where the resource module is unavailable.
+    """
+    if resource is None:
+        return None
+    scale = 1 if sys.platform == "darwin" else 1024
+    return scale * max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+
+
+def offsets_from_counts(counts):
+    offsets = array("i", [0]) * (len(counts) + 1)
+    total = 0
+    for i, count in enumerate(counts):
+        total += count
+        offsets[i + 1] = total
+    return offsets
+
+
+def sorted_order(keys):
+    """
+    Returns the positions of `keys` as an array, sorted by key.
+    """
+    return array("i", sorted(range(len(keys)), key=keys.__getitem__))
+
+
+def parse_year(year):
+    """
+    Returns `year` as an integer, or -1 when it is missing or malformed.
+    """
+    try:
+        return int(year)
+    except ValueError:
+        return -1
+
+
+def align(n):
+    return (n + 7) & ~7
+
+
+def source_stamps(directory):
+    """
+    Returns the size and modification time of each source CSV file, which
+    identify the data a snapshot was built from.
+    """
+    stamps = {}
+    for name in SOURCES:
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except OSError:
+            continue
+        stamps[name] = [stat.st_size, stat.st_mtime_ns]
+    return stamps
+
+
+class StringTable(Sequence):
+    """
+    Immutable sequence of strings stored as one UTF-8 blob plus an array of
+    offsets, so it can live in a snapshot and be decoded on access.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = array("q", [0]) * (len(encoded) + 1)
+        total = 0
+        for i, data in enumerate(encoded):
+            total += len(data)
+            offsets[i + 1] = total
+        return cls(offsets, b"".join(encoded))
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def decode(self):
+        """
+        Returns all the strings as a list, decoding the blob in one go.
+        """
+        offsets = self.offsets.tolist()
+        data = bytes(self.blob)
+        text = data.decode("utf-8")
+
+        # In pure ASCII, byte offsets are character offsets too
+        if len(text) == len(data):
+            return [text[start:end] for start, end in zip(offsets, offsets[1:])]
+        return [data[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class RangeTop():
+    """
+    Segment tree over a sequence of integer `weights`, holding the position
+    of the largest weight of each node (the first one on ties), so the
+    heaviest positions of any range come out in O(log n) each.
+    """
+
+    def __init__(self, weights):
+        self.weights = weights
+        n = self.n = len(weights)
+        self.tree = array("i", [-1]) * (2 * n)
+        self.tree[n:] = array("i", range(n))
+        for i in range(n - 1, 0, -1):
+            self.tree[i] = self.best(self.tree[2 * i], self.tree[2 * i + 1])
+
+    def best(self, i, j):
+        if i == -1:
+            return j
+        if j == -1:
+            return i
+        weights = self.weights
+        if weights[j] > weights[i] or (weights[j] == weights[i] and j < i):
+            return j
+        return i
+
+    def argmax(self, lo, hi):
+        """
+        Returns the position of the largest weight in [lo, hi).
+        """
+        result = -1
+        lo += self.n
+        hi += self.n
+        while lo < hi:
+            if lo & 1:
+                result = self.best(result, self.tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                result = self.best(result, self.tree[hi])
+            lo //= 2
+            hi //= 2
+        return result
+
+    def top(self, lo, hi, k):
+        """
+        Returns up to `k` positions of [lo, hi), heaviest first: each one
+        found splits its range in two, and a heap keeps the best candidate
+        of every range found so far.
+        """
+        heap = []
+
+        def push(a, b):
+            if a < b:
+                m = self.argmax(a, b)
+                heappush(heap, (-self.weights[m], m, a, b))
+
+        push(lo, hi)
+        found = []
+        while heap and len(found) < k:
+            _, m, a, b = heappop(heap)
+            found.append(m)
+            push(a, m)
+            push(m + 1, b)
+        return found
+
+
+class SortedIndex(Mapping):
+    """
+    Read-only mapping from strings to dense ids, answered by binary search
+    over `order`, the ids sorted by `fold(strings[id])`.
+
+    With `unique`, each key maps to a single id; otherwise it maps to the
+    list of all ids sharing that key.
+    """
+
+    def __init__(self, strings, order, unique=True, fold=None):
+        self.strings = strings
+        self.order = order
+        self.unique = unique
+        self.fold = fold
+        self.length = None
+
+    def key(self, i):
+        if self.fold is None:
+            return self.strings[i]
+        return self.fold(self.strings[i])
+
+    def bounds(self, key):
+        """
+        Returns the slice of `order` whose ids have exactly this key.
+        """
+        lo = bisect_left(self.order, key, key=self.key)
+        hi = lo
+        while hi < len(self.order) and self.key(self.order[hi]) == key:
+            hi += 1
+        return lo, hi
+
+    def __getitem__(self, key):
+        lo, hi = self.bounds(key)
+        if lo == hi:
+            raise KeyError(key)
+        if self.unique:
+            return self.order[lo]
+        return list(self.order[lo:hi])
+
+    def prefix_bounds(self, prefix):
+        """
+        Returns (lo, exact, hi) such that `order[lo:hi]` holds the ids whose
+        key starts with `prefix`, and `order[lo:exact]` those whose key is
+        exactly `prefix`.
+        """
+        lo = bisect_left(self.order, prefix, key=self.key)
+        exact = bisect_right(self.order, prefix, lo=lo, key=self.key)
+        hi = bisect_left(self.order, prefix + "\U0010ffff", lo=exact, key=self.key)
+        return lo, exact, hi
+
+    def prefix(self, prefix, limit):
+        """
+        Returns up to `limit` ids whose key starts with `prefix`, in key
+        order, found by binary search over the sorted ids.
+        """
+        ids = []
+        for i in range(bisect_left(self.order, prefix, key=self.key), len(self.order)):
+            p = self.order[i]
+            if len(ids) == limit or not self.key(p).startswith(prefix):
+                break
+            ids.append(p)
+        return ids
+
+    def __iter__(self):
+        previous = None
+        for i in self.order:
+            key = self.key(i)
+            if key != previous:
+                yield key
+                previous = key
+
+    def __len__(self):
+        if self.unique:
+            return len(self.order)
+        if self.length is None:
+            self.length = sum(1 for _ in self)
+        return self.length
+
+
+class PeopleView(Mapping):
+    """
+    Read-only view of a Graph with the shape of the original `people` dict:
+    person_id -> {"name", "birth", "movies" (a set of movie_ids)}.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        g = self.graph
+        p = g.person_index[person_id]
+        return {
+            "name": g.person_names[p],
+            "birth": g.person_births[p],
+            "movies": {g.movie_ids[m] for m in g.movies_of(p)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.person_ids)
+
+    def __len__(self):
+        return self.graph.person_count
+
+    def __contains__(self, person_id):
+        return person_id in self.graph.person_index
+
+
+class MoviesView(Mapping):
+    """
+    Read-only view of a Graph with the shape of the original `movies` dict:
+    movie_id -> {"title", "year", "stars" (a set of person_ids)}.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        g = self.graph
+        m = g.movie_index[movie_id]
+        return {
+            "title": g.movie_titles[m],
+            "year": g.movie_years[m],
+            "stars": {g.person_ids[p] for p in g.stars_of(m)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.movie_ids)
+
+    def __len__(self):
+        return self.graph.movie_count
+
+    def __contains__(self, movie_id):
+        return movie_id in self.graph.movie_index
+
+
+class NamesView(Mapping):
+    """
+    Read-only view of a Graph with the shape of the original `names` dict:
+    lowercase name -> set of person_ids.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, name):
+        g = self.graph
+        return {g.person_ids[p] for p in g.name_index[name]}
+
+    def __iter__(self):
+        return iter(self.graph.name_index)
+
+    def __len__(self):
+        return len(self.graph.name_index)
+
+    def __contains__(self, name):
+        return name in self.graph.name_index
@@ -0,0 +1,422 @@
+import time
+
+from array import array
+from itertools import compress
+from operator import sub
+
+
+class BFSTree():
+    """
+    Breadth-first predecessor tree of every person reachable from `root`.
+
+    For each person reached, `parent_person` holds the next person on a
+    shortest path back to the root and `parent_movie` the movie they share;
+    unreached people hold -1.
+    """
+
+    def __init__(self, graph, root):
+        self.root = root
+        self.parent_person = array("i", [-1]) * graph.person_count
+        self.parent_movie = array("i", [-1]) * graph.person_count
+        self.parent_person[root] = root
+
+        # Each movie connects all of its stars at once, so it only has to be
+        # scanned the first time one of them is expanded
+        seen_movies = bytearray(graph.movie_count)
+        level = [root]
+        while level:
+            next_level = []
+            for person in level:
+                for movie in graph.movies_of(person):
+                    if seen_movies[movie]:
+                        continue
+                    seen_movies[movie] = 1
+                    for actor in graph.stars_of(movie):
+                        if self.parent_person[actor] == -1:
+                            self.parent_person[actor] = person
+                            self.parent_movie[actor] = movie
+                            next_level.append(actor)
+            level = next_level
+
+    def reaches(self, person):
+        return self.parent_person[person] != -1
+
+    def path_to_root(self, person):
+        """
+        Returns the (movie, person) steps leading from `person` to the root.
+        """
+        path = []
+        while person != self.root:
+            movie, person = self.parent_movie[person], self.parent_person[person]
+            path.append((movie, person))
+        return path
+
+    def path_from_root(self, person):
+        """
+        Returns the (movie, person) steps leading from the root to `person`.
+        """
+        path = []
+        while person != self.root:
+            path.append((self.parent_movie[person], person))
+            person = self.parent_person[person]
+        path.reverse()
+        return path
+
+    def nbytes(self):
+        return memoryview(self.parent_person).nbytes + memoryview(self.parent_movie).nbytes
+
+
+def neighbors_in(graph, person, mask):
+    """
+    Like graph.neighbors, but only through movies whose entry in the
+    bytearray `mask` is set.
+    """
+    for movie in graph.movies_of(person):
+        if mask[movie]:
+            for actor in graph.stars_of(movie):
+                yield movie, actor
+
+
+def bfs_levels(graph, root, max_depth=None):
+    """
+    Yields the people at distance 0, 1, 2, ... (up to `max_depth`) from
+    `root`, one list per level. Visited people and movies are tracked in
+    bytearrays, and every movie is scanned at most once.
+    """
+    seen_people = bytearray(graph.person_count)
+    seen_movies = bytearray(graph.movie_count)
+    seen_people[root] = 1
+    level = [root]
+    depth = 0
+    while level:
+        yield level
+        if depth == max_depth:
+            return
+        depth += 1
+        next_level = []
+        for person in level:
+            for movie in graph.movies_of(person):
+                if seen_movies[movie]:
+                    continue
+                seen_movies[movie] = 1
+                for actor in graph.stars_of(movie):
+                    if not seen_people[actor]:
+                        seen_people[actor] = 1
+                        next_level.append(actor)
+        level = next_level
+
+
+class LandmarkIndex():
+    """
+    BFS distances from `k` high-degree landmark people to everyone else.
+
+    Distances are kept person-major in a bytearray (`k` bytes per person),
+    with UNKNOWN for people a landmark does not reach or reaches only beyond
+    254 steps. By the triangle inequality, every landmark `L` reaching both
+    `u` and `v` gives |d(L, u) - d(L, v)| <= d(u, v) <= d(L, u) + d(L, v).
+    """
+
+    UNKNOWN = 255
+
+    def __init__(self, graph, k):
+        start = time.perf_counter()
+
+        # A person's degree is the number of co-star slots in their movies
+        degree = [
+            sum(len(graph.stars_of(m)) for m in graph.movies_of(p))
+            for p in range(graph.person_count)
+        ]
+        self.landmarks = sorted(range(graph.person_count), key=degree.__getitem__, reverse=True)[:k]
+        self.k = len(self.landmarks)
+
+        # How far each landmark's BFS went, which caps the bounds it can give
+        self.eccentricity = []
+        self.distances = bytearray([self.UNKNOWN]) * (graph.person_count * self.k)
+        for i, landmark in enumerate(self.landmarks):
+            depth = 0
+            for depth, level in enumerate(bfs_levels(graph, landmark, self.UNKNOWN - 1)):
+                for person in level:
+                    self.distances[person * self.k + i] = depth
+            self.eccentricity.append(depth)
+
+        self.build_seconds = time.perf_counter() - start
+
+    def row(self, person):
+        return self.distances[person * self.k:(person + 1) * self.k]
+
+    def bounds(self, u, v):
+        """
+        Returns (lower, upper) bounds on the distance between `u` and `v`;
+        `upper` is None when no landmark reaches both of them.
+        """
+        lower, upper = 0, None
+        for du, dv in zip(self.row(u), self.row(v)):
+            if du == self.UNKNOWN or dv == self.UNKNOWN:
+                continue
+            lower = max(lower, abs(du - dv))
+            if upper is None or du + dv < upper:
+                upper = du + dv
+        return lower, upper
+
+    def goal(self, v):
+        """
+        Prepares person `v` as the fixed end of many `lower` calls. Returns
+        (known, distances, reach): a mask of the landmarks reaching `v`,
+        their distances to it, and the largest lower bound they can prove
+        for anyone.
+        """
+        row = self.row(v)
+        known = bytes(dv != self.UNKNOWN for dv in row)
+        distances = bytes(compress(row, known))
+        reach = max(
+            (max(dv, eccentricity - dv)
+             for dv, eccentricity in zip(compress(row, known), compress(self.eccentricity, known))),
+            default=0
+        )
+        return known, distances, reach
+
+    def lower(self, u, goal):
+        """
+        Returns a lower bound on the distance between `u` and a person
+        prepared with `goal`, for `u` in the same component as them.
+
+        Only landmarks reaching the goal count. Those also reach `u` unless
+        it is over 254 steps away, where its UNKNOWN entry still gives a
+        valid bound, so the rows are compared without looking for UNKNOWN.
+        The comparison runs over bytes in C, with no per-landmark Python
+        loop.
+        """
+        known, distances, _ = goal
+        k = self.k
+        row = self.distances[u * k:(u + 1) * k]
+        return max(map(abs, map(sub, compress(row, known), distances)), default=0)
+
+    def nbytes(self):
+        return len(self.distances)
+
+
+class CostarIndex():
+    """
+    Deduplicated person -> person co-star adjacency in CSR form.
+
+    Each pair of co-stars is kept once, with one of their shared movies as
+    the witness for paths, and people are not listed as their own co-star.
+    Meant for datasets small enough that the full adjacency fits in memory.
+    """
+
+    def __init__(self, graph):
+        offsets = array("i", [0])
+        self.costars = array("i")
+        self.movies = array("i")
+
+        # Number of (movie, person) pairs the plain adjacency would yield
+        self.pairs_total = 0
+        for p in range(graph.person_count):
+            found = {}
+            for movie, actor in graph.neighbors(p):
+                self.pairs_total += 1
+                if actor != p and actor not in found:
+                    found[actor] = movie
+            self.costars.extend(found.keys())
+            self.movies.extend(found.values())
+            offsets.append(len(self.costars))
+        self.offsets = offsets
+
+    def neighbors(self, p):
+        costars, movies = self.costars, self.movies
+        for i in range(self.offsets[p], self.offsets[p + 1]):
+            yield movies[i], costars[i]
+
+    def nbytes(self):
+        return sum(memoryview(a).nbytes for a in (self.offsets, self.costars, self.movies))
+
+    def stats(self):
+        return {
+            "pairs_total": self.pairs_total,
+            "pairs_kept": len(self.costars),
+            "bytes": self.nbytes(),
+        }
+
+
+def trigrams(text):
+    """
+    Returns the set of character trigrams of `text`, padded so that word
+    starts and ends count as well.
+    """
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex():
+    """
+    Inverted index from lowercase name trigrams to the people whose name
+    contains them, for typo-tolerant name lookup.
+    """
+
+    # Trigrams shared by more people than this are too common to help rank
+    MAX_POSTING = 50000
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.postings = {}
+        for p, name in enumerate(graph.person_names):
+            for gram in trigrams(name.lower()):
+                posting = self.postings.get(gram)
+                if posting is None:
+                    posting = self.postings[gram] = array("i")
+                posting.append(p)
+
+    def search(self, query, limit):
+        """
+        Returns up to `limit` person ids whose names share the most trigrams
+        with `query`, best match (by Jaccard similarity) first.
+        """
+        grams = trigrams(query.lower())
+        shared = {}
+        for gram in grams:
+            posting = self.postings.get(gram, ())
+            if len(posting) > self.MAX_POSTING:
+                continue
+            for p in posting:
+                shared[p] = shared.get(p, 0) + 1
+
+        # Only the candidates sharing the most trigrams are scored exactly
+        candidates = sorted(shared, key=shared.__getitem__, reverse=True)[:10 * limit]
+
+        def similarity(p):
+            common = shared[p]
+            other = len(trigrams(self.graph.person_names[p].lower()))
+            return common / (len(grams) + other - common)
+
+        return sorted(candidates, key=similarity, reverse=True)[:limit]
+
+    def nbytes(self):
+        return sum(memoryview(posting).nbytes for posting in self.postings.values())
+
+
+class ShortestPathDAG():
+    """
+    Layered predecessor DAG of all shortest paths from `source` to `target`.
+
+    A BFS from the source finds everyone's depth up to the target's, then a
+    backward pass from the target records, for each of its ancestors, every
+    (movie, person) step leading to them from the previous layer. Path
+    counts come from dynamic programming over the DAG, and the paths
+    themselves are generated lazily, one at a time. With `movie_mask`, only
+    movies flagged in it are used. Passing `reachable=False` (the two are
+    in different components) skips the BFS and gives an empty DAG.
+    """
+
+    def __init__(self, graph, source, target, movie_mask=None, reachable=True):
+        self.source = source
+        self.target = target
+        self.depth = {source: 0}
+
+        # Forward pass: plain level-synchronous BFS, scanning each movie once
+        seen_movies = set()
+        level = [source] if reachable else []
+        depth = 0
+        while level and target not in self.depth:
+            depth += 1
+            next_level = []
+            for person in level:
+                for movie in graph.movies_of(person):
+                    if movie in seen_movies or (movie_mask is not None and not movie_mask[movie]):
+                        continue
+                    seen_movies.add(movie)
+                    for actor in graph.stars_of(movie):
+                        if actor not in self.depth:
+                            self.depth[actor] = depth
+                            next_level.append(actor)
+            level = next_level
+
+        # Backward pass: layer by layer from the target, keep every step that
+        # comes from exactly one level closer to the source
+        self.predecessors = {source: []}
+        if target not in self.depth or target == source:
+            return
+        layer = [target]
+        self.predecessors[target] = []
+        while layer and self.depth[layer[0]] > 1:
+            previous_layer = []
+            for person in layer:
+                wanted = self.depth[person] - 1
+                for movie in graph.movies_of(person):
+                    if movie_mask is not None and not movie_mask[movie]:
+                        continue
+                    for actor in graph.stars_of(movie):
+                        if self.depth.get(actor) == wanted:
+                            self.predecessors[person].append((movie, actor))
+                            if actor not in self.predecessors:
+                                self.predecessors[actor] = []
+                                previous_layer.append(actor)
+            layer = previous_layer
+
+        # The last layer hangs directly off the source
+        for person in layer:
+            for movie in graph.movies_of(person):
+                if movie_mask is not None and not movie_mask[movie]:
+                    continue
+                if source in graph.stars_of(movie):
+                    self.predecessors[person].append((movie, source))
+
+    @property
+    def degrees(self):
+        """
+        Length of the shortest paths, or None if there are none.
+        """
+        return self.depth.get(self.target)
+
+    def count(self):
+        """
+        Returns the number of distinct shortest paths.
+        """
+        if self.target not in self.depth:
+            return 0
+
+        # The DAG only holds the target's ancestors; process them from the
+        # source up
+        counts = {}
+        for person in sorted(self.predecessors, key=self.depth.__getitem__):
+            if person == self.source:
+                counts[person] = 1
+            else:
+                counts[person] = sum(counts[p] for _, p in self.predecessors[person])
+        return counts[self.target]
+
+    def paths(self, limit=None):
+        """
+        Yields up to `limit` shortest paths as lists of (movie, person)
+        steps, walking the DAG backwards from the target depth-first so
+        only one path is held in memory at a time.
+        """
+        if self.target not in self.depth or limit == 0:
+            return
+
+        # A person is zero steps away from themselves, by the empty path
+        if self.target == self.source:
+            yield []
+            return
+        produced = 0
+        steps = []
+        stack = [iter(self.predecessors[self.target])]
+        current = [self.target]
+        while stack:
+            step = next(stack[-1], None)
+            if step is None:
+                stack.pop()
+                current.pop()
+                if steps:
+                    steps.pop()
+                continue
+            movie, person = step
+            steps.append((movie, current[-1]))
+            if person == self.source:
+                yield steps[::-1]
+                produced += 1
+                if produced == limit:
+                    return
+                steps.pop()
+                continue
+            stack.append(iter(self.predecessors[person]))
+            current.append(person)
@@ -0,0 +1,228 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import degrees
+
+# Number of recent requests per endpoint kept for latency percentiles
+LATENCY_WINDOW = 10000
+
+# Most names a single /search request may ask for
+SEARCH_LIMIT = 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve degrees queries over HTTP.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument(
+        "--backend", choices=("memory", "sqlite"), default="memory",
+        help="keep the graph in memory, or read it lazily from SQLite "
+             "(which never builds cached BFS trees)"
+    )
+    parser.add_argument(
+        "--trigrams", action="store_true",
+        help="build the trigram index for fuzzy name search"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=os.cpu_count(),
+        help="worker processes for path searches"
+    )
+    args = parser.parse_args()
+
+    print("Loading data...")
+    degrees.load_data(args.directory, args.backend)
+    if args.trigrams:
+        degrees.build_trigrams()
+    print("Data loaded.")
+
+    server = Server(args.jobs, args.directory, args.backend)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+class Server():
+    """
+    Long-running HTTP front-end over the loaded graph.
+
+    Endpoints (all GET, answering JSON):
+      /path?source=...&target=...    shortest path between two people
+      /search?q=...&limit=...&fuzzy=1 name lookup (fuzzy needs --trigrams)
+      /stats                          latency percentiles and cache counters
+
+    Path searches run on a pool of forked workers that inherit the graph,
+    so slow searches never block name lookups or other requests. Each
+    worker keeps its own caches; /stats reports the counters they last sent
+    back alongside those of the server process.
+    """
+
+    def __init__(self, jobs, directory, backend):
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+            self.pool = ProcessPoolExecutor(jobs, mp_context=context)
+        else:
+            self.pool = ProcessPoolExecutor(
+                jobs, initializer=degrees.load_data,
+                initargs=(directory, backend)
+            )
+        self.latencies = {}
+
+        # Latest cache counters reported by each worker process
+        self.worker_stats = {}
+        self.routes = {
+            "/path": self.path,
+            "/search": self.search,
+            "/stats": self.stats,
+        }
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving on http://{host}:{port}")
+        with self.pool:
+            async with server:
+                await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        """
+        Answers the requests of one connection until the client closes it.
+        """
+        try:
+            while True:
+                request = await reader.readline()
+                if not request:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    method, target, version = request.decode("latin-1").split()
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "malformed request"}, False)
+                    break
+                keep_alive = (
+                    version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                )
+                status, body = await self.dispatch(method, target)
+                await self.respond(writer, status, body, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target):
+        url = urlsplit(target)
+        route = self.routes.get(url.path)
+        if method != "GET":
+            return 405, {"error": "only GET is supported"}
+        if route is None:
+            return 404, {"error": f"unknown endpoint {url.path}"}
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        start = time.perf_counter()
+        try:
+            return await route(query)
+        except KeyError as e:
+            return 400, {"error": f"missing parameter {e.args[0]}"}
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        finally:
+            self.latencies.setdefault(url.path, deque(maxlen=LATENCY_WINDOW)).append(
+                time.perf_counter() - start
+            )
+
+    async def respond(self, writer, status, body, keep_alive):
+        data = json.dumps(body).encode()
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+        writer.write(
+            f"HTTP/1.1 {status} {reason.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+            + data
+        )
+        await writer.drain()
+
+    async def path(self, query):
+        source, error = degrees.resolve_person(query["source"])
+        if error is None:
+            target, error = degrees.resolve_person(query["target"])
+        if error is not None:
+            return 400, {"error": error}
+
+        loop = asyncio.get_running_loop()
+        pid, path, stats = await loop.run_in_executor(self.pool, find_path, source, target)
+        self.worker_stats[pid] = stats
+        return 200, {
+            "source": source,
+            "target": target,
+            "degrees": None if path is None else len(path),
+            "path": path,
+        }
+
+    async def search(self, query):
+        limit = int(query.get("limit", 10))
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        limit = min(limit, SEARCH_LIMIT)
+        fuzzy = query.get("fuzzy", "0") not in ("0", "")
+        graph = degrees.graph
+        results = []
+        for person_id in degrees.search_names(query["q"], limit, fuzzy):
+            p = graph.person_index[person_id]
+            results.append({
+                "id": person_id,
+                "name": graph.person_names[p],
+                "birth": graph.person_births[p],
+            })
+        return 200, {"results": results}
+
+    async def stats(self, query):
+        return 200, {
+            "latency": {
+                path: percentiles(samples) for path, samples in self.latencies.items()
+            },
+            "caches": degrees.cache_stats(),
+            "workers": self.worker_stats,
+        }
+
+
+def find_path(source, target):
+    """
+    Runs shortest_path in a worker, returning the worker's pid and cache
+    counters along with the path.
+    """
+    path = degrees.shortest_path(source, target)
+    return os.getpid(), path, degrees.cache_stats()
+
+
+def percentiles(samples):
+    """
+    Returns the request count and p50/p90/p99 latencies in milliseconds.
+    """
+    ordered = sorted(samples)
+    result = {"count": len(ordered)}
+    for p in (50, 90, 99):
+        index = min(len(ordered) - 1, int(len(ordered) * p / 100))
+        result[f"p{p}_ms"] = round(ordered[index] * 1000, 3)
+    return result
+
+
+if __name__ == "__main__":
+    main()
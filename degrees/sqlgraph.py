@@ -0,0 +1,318 @@
+import csv
+import json
+import os
+import sqlite3
+
+from array import array
+from collections.abc import Mapping, Sequence
+
+from cache import LRUCache
+from graph import source_stamps
+
+# SQLite database written next to the CSV files by the first load
+DATABASE = "degrees.sqlite"
+
+# Number of CSV rows inserted per executemany call during the import
+IMPORT_BATCH = 10000
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE people (
+    idx INTEGER PRIMARY KEY, id TEXT, name TEXT, lower_name TEXT, birth TEXT,
+    component INTEGER
+);
+CREATE TABLE movies (idx INTEGER PRIMARY KEY, id TEXT, title TEXT, year TEXT);
+CREATE TABLE stars (
+    person INTEGER, movie INTEGER, PRIMARY KEY (person, movie)
+) WITHOUT ROWID;
+CREATE TABLE components (idx INTEGER PRIMARY KEY, size INTEGER);
+"""
+
+INDEXES = """
+CREATE INDEX people_id ON people (id);
+CREATE INDEX people_lower_name ON people (lower_name);
+CREATE INDEX movies_id ON movies (id);
+CREATE INDEX stars_movie ON stars (movie, person);
+"""
+
+
+class SQLiteGraph():
+    """
+    Lazy person/movie graph backed by an indexed SQLite database.
+
+    Offers the same interface as Graph, with the same dense ids (the row
+    order of people.csv and movies.csv), but rows are only read when asked
+    for. Adjacency lists and rows go through an LRU page cache, so memory
+    tracks the working set rather than the size of the dataset.
+
+    Every query is a constant SQL string, so sqlite3's statement cache keeps
+    them prepared across calls.
+    """
+
+    def __init__(self, directory, cache_budget=2 ** 20):
+        self.path = os.path.join(directory, DATABASE)
+        self.load_stats = None
+        stamps = source_stamps(directory)
+        self.connect()
+        if self.stamps() != stamps:
+            self.db.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.connect()
+            self.import_csv(directory, stamps)
+
+        # Entries are charged roughly by the number of ids or fields they hold
+        self.pages = LRUCache(cache_budget, sizeof=lambda value: len(value) + 1)
+
+        self.person_count = self.scalar("SELECT COUNT(*) FROM people")
+        self.movie_count = self.scalar("SELECT COUNT(*) FROM movies")
+
+        self.person_ids = Column(self.person_row, 0, self.person_count)
+        self.person_names = Column(self.person_row, 1, self.person_count)
+        self.person_births = Column(self.person_row, 2, self.person_count)
+        self.movie_ids = Column(self.movie_row, 0, self.movie_count)
+        self.movie_titles = Column(self.movie_row, 1, self.movie_count)
+        self.movie_years = Column(self.movie_row, 2, self.movie_count)
+        self.person_index = Lookup(self, "people", "id")
+        self.movie_index = Lookup(self, "movies", "id")
+        self.name_index = Lookup(self, "people", "lower_name", unique=False)
+        self.component_sizes = array("i", (
+            size for size, in self.db.execute("SELECT size FROM components ORDER BY idx")
+        ))
+
+    def connect(self):
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.pid = os.getpid()
+
+    def execute(self, sql, parameters=()):
+        # SQLite connections must not be used across fork, so a forked
+        # worker opens its own
+        if self.pid != os.getpid():
+            self.connect()
+        return self.db.execute(sql, parameters)
+
+    def scalar(self, sql, parameters=()):
+        row = self.execute(sql, parameters).fetchone()
+        return None if row is None else row[0]
+
+    def stamps(self):
+        try:
+            return json.loads(self.scalar("SELECT value FROM meta WHERE key = 'sources'"))
+        except (sqlite3.Error, TypeError):
+            return None
+
+    def import_csv(self, directory, stamps):
+        """
+        Stream the CSV files of `directory` into a fresh database.
+        """
+        db = self.db
+        db.executescript(SCHEMA)
+        db.execute("CREATE TEMP TABLE raw_stars (person_id TEXT, movie_id TEXT)")
+
+        def batches(name, columns):
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                reader = csv.reader(f)
+                header = next(reader)
+                positions = [header.index(column) for column in columns]
+                batch = []
+                for row in reader:
+                    batch.append([row[i] for i in positions])
+                    if len(batch) == IMPORT_BATCH:
+                        yield batch
+                        batch = []
+                if batch:
+                    yield batch
+
+        with db:
+            idx = 0
+            for batch in batches("people.csv", ("id", "name", "birth")):
+                db.executemany(
+                    "INSERT INTO people (idx, id, name, lower_name, birth, component) "
+                    "VALUES (?, ?, ?, ?, ?, 0)",
+                    ((idx + i, id, name, name.lower(), birth)
+                     for i, (id, name, birth) in enumerate(batch))
+                )
+                idx += len(batch)
+
+            idx = 0
+            for batch in batches("movies.csv", ("id", "title", "year")):
+                db.executemany(
+                    "INSERT INTO movies (idx, id, title, year) VALUES (?, ?, ?, ?)",
+                    ((idx + i, *row) for i, row in enumerate(batch))
+                )
+                idx += len(batch)
+
+            db.executescript(INDEXES)
+            for batch in batches("stars.csv", ("person_id", "movie_id")):
+                db.executemany("INSERT INTO raw_stars VALUES (?, ?)", batch)
+            db.execute(
+                "INSERT OR IGNORE INTO stars "
+                "SELECT people.idx, movies.idx FROM raw_stars "
+                "JOIN people ON people.id = raw_stars.person_id "
+                "JOIN movies ON movies.id = raw_stars.movie_id"
+            )
+            db.execute("DROP TABLE raw_stars")
+
+            self.label_components()
+            db.execute(
+                "INSERT INTO meta VALUES ('sources', ?)", (json.dumps(stamps),)
+            )
+
+    def label_components(self):
+        """
+        Union-find over the stars of each movie, as in Graph.label_components,
+        with only the parent array held in memory.
+        """
+        P = self.scalar("SELECT COUNT(*) FROM people")
+        parent = array("i", range(P))
+
+        def find(p):
+            while parent[p] != p:
+                parent[p] = parent[parent[p]]
+                p = parent[p]
+            return p
+
+        current, root = None, None
+        for person, movie in self.db.execute("SELECT person, movie FROM stars ORDER BY movie"):
+            if movie != current:
+                current, root = movie, find(person)
+                continue
+            other = find(person)
+            if other != root:
+                parent[other] = root
+
+        labels, sizes = {}, []
+
+        def components():
+            for p in range(P):
+                r = find(p)
+                if r not in labels:
+                    labels[r] = len(sizes)
+                    sizes.append(0)
+                sizes[labels[r]] += 1
+                yield labels[r], p
+
+        self.db.executemany("UPDATE people SET component = ? WHERE idx = ?", components())
+        self.db.executemany("INSERT INTO components VALUES (?, ?)", enumerate(sizes))
+
+    def cached(self, key, sql, parameters):
+        value = self.pages.get(key)
+        if value is None:
+            value = self.pages.put(key, tuple(self.execute(sql, parameters)))
+        return value
+
+    def person_row(self, p):
+        rows = self.cached(
+            ("person", p), "SELECT id, name, birth, component FROM people WHERE idx = ?", (p,)
+        )
+        if not rows:
+            raise IndexError("person index out of range")
+        return rows[0]
+
+    def movie_row(self, m):
+        rows = self.cached(("movie", m), "SELECT id, title, year FROM movies WHERE idx = ?", (m,))
+        if not rows:
+            raise IndexError("movie index out of range")
+        return rows[0]
+
+    def movies_of(self, p):
+        rows = self.cached(("movies", p), "SELECT movie FROM stars WHERE person = ?", (p,))
+        return [movie for movie, in rows]
+
+    def stars_of(self, m):
+        rows = self.cached(("stars", m), "SELECT person FROM stars WHERE movie = ?", (m,))
+        return [person for person, in rows]
+
+    def neighbors(self, p):
+        for movie in self.movies_of(p):
+            for actor in self.stars_of(movie):
+                yield movie, actor
+
+    def names_by_movies(self, prefix, limit):
+        """
+        Returns up to `limit` person ids whose lowercase name starts with
+        `prefix`, ranked as Graph.names_by_movies does.
+        """
+        rows = self.execute(
+            "SELECT idx FROM people WHERE lower_name >= ? AND lower_name < ? "
+            "ORDER BY lower_name != ?, "
+            "(SELECT COUNT(*) FROM stars WHERE person = people.idx) DESC, lower_name, idx "
+            "LIMIT ?",
+            (prefix, prefix + "\U0010ffff", prefix, limit)
+        )
+        return [idx for idx, in rows]
+
+    def connected(self, p, q):
+        return self.person_row(p)[3] == self.person_row(q)[3]
+
+    def movies_in_years(self, first, last):
+        rows = self.execute(
+            "SELECT idx FROM movies WHERE CAST(year AS INTEGER) BETWEEN ? AND ?",
+            (-1 if first is None else first, 2 ** 31 if last is None else last)
+        )
+        return [idx for idx, in rows]
+
+    def nbytes(self):
+        return os.path.getsize(self.path)
+
+
+class Column(Sequence):
+    """
+    One field of the rows returned by `row(i)`, as a sequence over dense ids.
+    """
+
+    def __init__(self, row, field, length):
+        self.row = row
+        self.field = field
+        self.length = length
+
+    def __getitem__(self, i):
+        return self.row(i)[self.field]
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class Lookup(Mapping):
+    """
+    Read-only mapping from a text column of `table` to dense ids, answered
+    through its SQL index. With `unique=False` it maps to lists of ids.
+    """
+
+    def __init__(self, graph, table, column, unique=True):
+        self.graph = graph
+        self.unique = unique
+        self.select = f"SELECT idx FROM {table} WHERE {column} = ? ORDER BY idx"
+        self.prefix_sql = (
+            f"SELECT idx FROM {table} WHERE {column} >= ? AND {column} < ? "
+            f"ORDER BY {column}, idx LIMIT ?"
+        )
+        self.keys_sql = f"SELECT DISTINCT {column} FROM {table} ORDER BY {column}"
+        self.count_sql = f"SELECT COUNT(DISTINCT {column}) FROM {table}"
+
+    def __getitem__(self, key):
+        rows = self.graph.cached((self.select, key), self.select, (key,))
+        if not rows:
+            raise KeyError(key)
+        if self.unique:
+            return rows[0][0]
+        return [idx for idx, in rows]
+
+    def prefix(self, prefix, limit):
+        """
+        Returns up to `limit` ids whose key starts with `prefix`, in key
+        order, as a range scan over the column's index.
+        """
+        rows = self.graph.execute(self.prefix_sql, (prefix, prefix + "\U0010ffff", limit))
+        return [idx for idx, in rows]
+
+    def __iter__(self):
+        for key, in self.graph.execute(self.keys_sql):
+            yield key
+
+    def __len__(self):
+        return self.graph.scalar(self.count_sql)
@@ -1,48 +1,142 @@
+import json
+import math
+import mmap
 import os
 import random
 import re
+import struct
 import sys
 
-# Will help us create a dictionary of appearences initialized at 0
-from collections import defaultdict
-
-# Will help us use a dictionary without modifying it
-import copy
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Iteration stops once the ranks change by less than this in total (L1)
+TOLERANCE = 0.001
+
+# Iterations between two extrapolations, when iterate_pagerank uses them
+EXTRAPOLATE_EVERY = 10
+
+# Bytes of ranks personalized_pagerank keeps in memory at a time, roughly
+PERSONALIZED_MEMORY = 256 * 2 ** 20
+
+# Binary edge lists: magic, then the number of pages, of links and of bytes
+# of page names, then the sorted int32 sources and targets and the names
+EDGE_LIST_MAGIC = b"PREDGES1"
+EDGE_LIST_HEADER = struct.Struct("<8sQQQ")
+
+# Links stream_pagerank reads from the edge list at a time
+EDGE_BLOCK = 1 << 20
+
+# Links inside the HTML pages
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Where a link might begin: "<a" and whitespace, or a part of that cut off
+# at the end of the text read so far
+LINK_START = re.compile(r"<(?:a(?:\s|\Z)|\Z)")
+
+# Characters read from a page at a time while looking for links
+CHUNK = 1 << 16
+
+# File in the corpus directory remembering the links found in each page
+LINK_CACHE = ".pagerank-links.json"
+LINK_CACHE_VERSION = 1
+
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
+    if len(sys.argv) not in (2, 3):
+        sys.exit("Usage: python pagerank.py corpus [ranks.json]")
+    corpus = crawl(sys.argv[1], index=True)
     ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
-    print(f"PageRank Results from Iteration")
-    for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
 
+    # With a ranks file from an earlier run, only update the ranks it
+    # holds; either way, save them back for the next one
+    path = sys.argv[2] if len(sys.argv) == 3 else None
+    if path is not None and os.path.exists(path):
+        stats = {}
+        ranks = update_pagerank(corpus, DAMPING, load_ranks(path), stats)
+        print(f"PageRank Results Updated from {path}")
+        for page in sorted(ranks):
+            print(f"  {page}: {ranks[page]:.4f}")
+        print(
+            f"  ({stats['pushes']} pushes, {stats['edge_touches']} links followed, "
+            f"{stats['edge_touches_saved']} fewer than a cold start)"
+        )
+    else:
+        stats = {}
+        ranks = Ranks(iterate_pagerank(corpus, DAMPING, stats=stats), stats["iterations"])
+        print(f"PageRank Results from Iteration")
+        for page in sorted(ranks):
+            print(f"  {page}: {ranks[page]:.4f}")
+    if path is not None:
+        save_ranks(path, ranks)
 
-def crawl(directory):
+
+def crawl(directory, index=False, workers=None, cache=True, stats=None, edge_list=None):
     """
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
+
+    With `index=True`, return a Corpus instead: the same dictionary, along
+    with its reverse links, out-degrees and dangling pages.
+
+    The links found in each file are remembered in a cache file (LINK_CACHE)
+    in `directory`, keyed by file name, size and modification time, so
+    later crawls only parse the files that changed; `cache=False` ignores
+    it. Files are parsed by `workers` processes (one per CPU by default).
+    If `stats` is a dictionary, the number of pages, and how many of them
+    were parsed or taken from the cache, are stored in it.
+
+    With `edge_list`, a path, the links are also written there as a binary
+    edge list (see write_edge_list) for stream_pagerank.
     """
     pages = dict()
-
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
+    cache_path = os.path.join(directory, LINK_CACHE)
+    cached = read_link_cache(cache_path) if cache else {}
+    files = {}
+
+    # Reuse the links of every HTML file that did not change since the last
+    # crawl, and collect the others to be parsed
+    stale = []
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".html") or not entry.is_file():
             continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
+        info = entry.stat()
+        key = [info.st_size, info.st_mtime_ns]
+        hit = cached.get(entry.name)
+        if hit is not None and hit[:2] == key:
+            files[entry.name] = hit
+            pages[entry.name] = set(hit[2])
+        else:
+            stale.append((entry.name, key))
+
+    # Extract all links from the changed HTML files
+    workers = workers or os.cpu_count() or 1
+    paths = [os.path.join(directory, filename) for filename, _ in stale]
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(workers) as executor:
+            found = list(executor.map(
+                extract_links, paths, chunksize=max(1, len(paths) // (4 * workers))
+            ))
+    else:
+        found = [extract_links(path) for path in paths]
+    for (filename, key), links in zip(stale, found):
+        links.discard(filename)
+        pages[filename] = links
+        files[filename] = key + [sorted(links)]
+
+    if cache and (stale or len(files) != len(cached)):
+        write_link_cache(cache_path, files)
+    if stats is not None:
+        stats.update(pages=len(pages), parsed=len(stale), cached=len(pages) - len(stale))
 
     # Only include links to other pages in the corpus
     for filename in pages:
@@ -51,9 +145,84 @@ def crawl(directory):
             if link in pages
         )
 
+    if edge_list is not None:
+        write_edge_list(pages, edge_list)
+    if index:
+        return Corpus(pages)
     return pages
 
 
+def extract_links(path):
+    """
+    Return the set of link targets in the HTML file at `path`.
+
+    The file is read CHUNK characters at a time rather than whole. After
+    the last match of a chunk, the text from the first link that the next
+    chunk could still complete on is carried over, so the links found are
+    the same as matching LINK against the whole file.
+    """
+    links = set()
+    tail = ""
+    with open(path) as f:
+        while True:
+            chunk = f.read(CHUNK)
+            if not chunk:
+                break
+            text = tail + chunk
+            end = 0
+            for match in LINK.finditer(text):
+                links.add(match.group(1))
+                end = match.end()
+            tail = text[unfinished_link(text, end):]
+    return links
+
+
+def unfinished_link(text, start):
+    """
+    Return where the first possible link at or after `start` in `text`
+    begins, or len(text) if there isn't one.
+
+    LINK found every link from `start` on that the text completes, so any
+    "<a" there that matches once a closing href="" is appended is a link
+    still waiting for the rest of its tag (an attribute holding "<" or ">"
+    included).
+    """
+    probe = text + ' href=""'
+    for candidate in LINK_START.finditer(text, start):
+        if candidate.end() == len(text) or LINK.match(probe, candidate.start()):
+            return candidate.start()
+    return len(text)
+
+
+def read_link_cache(path):
+    """
+    Return the file name -> [size, mtime, links] entries of the link cache
+    at `path`, or an empty dictionary if it is missing or unreadable.
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") == LINK_CACHE_VERSION:
+            return data["files"]
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    return {}
+
+
+def write_link_cache(path, files):
+    """
+    Replace the link cache at `path` with the `files` entries.
+    """
+    temporary = path + ".tmp"
+    try:
+        with open(temporary, "w") as f:
+            json.dump({"version": LINK_CACHE_VERSION, "files": files}, f)
+        os.replace(temporary, path)
+    except OSError:
+        # A read-only corpus directory just means no cache
+        pass
+
+
 def transition_model(corpus, page, damping_factor):
     """
     Return a probability distribution over which page to visit next,
@@ -63,31 +232,21 @@ def transition_model(corpus, page, damping_factor):
     linked to by `page`. With probability `1 - damping_factor`, choose
     a link at random chosen from all pages in the corpus.
     """
-    mapping = {}
     LinkedPages = corpus[page]
     n = len(LinkedPages)
-    N = len(corpus.keys())
+    N = len(corpus)
 
     # We take 2 cases: 
 
-    # If the page has at least one link
-    if n != 0:
-
-        # Calculating the probabilities for the linked pages
-        for pages in LinkedPages:
-            mapping[pages] = damping_factor / n + (1 - damping_factor) / N
-
-        # Calculating the probabilities for the pages that are not linked
-        NotLinkedPages = set(corpus.keys()) - LinkedPages
-        for pages in NotLinkedPages:
-            mapping[pages] = (1 - damping_factor) / N
-
-    # If the pages has zero links
-    else:
+    # If the pages has zero links, we asign each page an equal probability
+    if n == 0:
+        return dict.fromkeys(corpus, 1 / N)
 
-        # We asign each page an equal probability
-        for pages in corpus.keys():
-            mapping[pages] = 1 / N
+    # Otherwise every page gets the random jump's share, and the linked
+    # pages get their share of the links on top of it
+    mapping = dict.fromkeys(corpus, (1 - damping_factor) / N)
+    for pages in LinkedPages:
+        mapping[pages] += damping_factor / n
 
     return mapping
 
@@ -100,32 +259,44 @@ def sample_pagerank(corpus, damping_factor, n):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
+    graph = link_graph(corpus)
+    N = len(graph.pages)
+    if N == 0:
+        return {}
+    out_offsets, targets = graph.out_offsets, graph.targets
 
     # "Repetitions" will help us count how many times we arrive 
-    # to each page
-    Repetitions = defaultdict(int)
+    # to each page, by id
+    Repetitions = [0] * N
 
     # Initialize the page randomly between all of the options and count it
-    ActualPage = random.choice(list(corpus.keys()))
+    ActualPage = random.randrange(N)
     Repetitions[ActualPage] += 1
 
-    # Now for each sample we take the actual page and calculate the next 
-    # one considering the probabilities for the actual page and keeping 
-    # track of all appearences
+    # Rather than building the whole transition model at every step, one
+    # uniform draw decides both things: below `damping_factor` we follow
+    # a link, and where in that interval it fell picks which one; above
+    # it (or on a page with no links) we jump to any page at random. Each
+    # jump starts a fresh, independent walk, and each step costs O(1).
     for _ in range(1, n):
-        probs = transition_model(corpus, ActualPage, damping_factor)
-        ActualPage = random.choices(list(probs.keys()), list(probs.values()), k=1)[0]
+        r = random.random()
+        start, stop = out_offsets[ActualPage], out_offsets[ActualPage + 1]
+        if r < damping_factor and start != stop:
+            ActualPage = targets[start + int(r / damping_factor * (stop - start))]
+        else:
+            ActualPage = random.randrange(N)
         Repetitions[ActualPage] += 1
     
-    # We have a dictionary with the number of appearences, to take the 
-    # ranks we have to divide by the number of samples
-    for page in Repetitions:
-        Repetitions[page] /= n 
-
-    return dict(Repetitions)
+    # We have the number of appearences, to take the ranks we have to
+    # divide by the number of samples
+    return {page: Repetitions[i] / n for i, page in enumerate(graph.pages)}
 
 # This function will help us to get the pages that link to a certain page 
 def PagesThatLinkTo(corpus, page):
+    # A Corpus already knows its reverse links
+    if isinstance(corpus, Corpus):
+        return corpus.reverse[page] | corpus.dangling
+
     ans = set()
     for i in corpus:
         # By adding "not corpus[i]" we are treating pages with no links 
@@ -134,7 +305,11 @@ def PagesThatLinkTo(corpus, page):
             ans.add(i)
     return ans
 
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(
+    corpus, damping_factor, initial=None, stats=None, method="jacobi", norm="l1",
+    tolerance=TOLERANCE, max_iterations=None, extrapolation=None,
+    extrapolate_every=EXTRAPOLATE_EVERY
+):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -142,44 +317,667 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    With `initial`, the ranks of an earlier run (see load_ranks), the
+    iteration starts from them instead of from 1 / N.
+
+    The iteration can be tuned with:
+      method            "jacobi" computes every new rank from the previous
+                        ones; "gauss-seidel" updates the ranks in place, so
+                        each page already sees the new ranks of the pages
+                        before it
+      norm, tolerance   stop once the ranks move by less than `tolerance`,
+                        in total ("l1") or for any single page ("linf")
+      max_iterations    stop after this many iterations regardless
+      extrapolation     every `extrapolate_every` iterations, jump ahead
+                        from the last iterates with "aitken" (Aitken's
+                        delta-squared, page by page) or "quadratic"
+                        (quadratic extrapolation over the last four)
+
+    If `stats` is a dictionary, the options used, the number of iterations,
+    extrapolations and links followed, the change of every iteration
+    ("residuals") and whether it converged are stored in it.
+    """
+    if method not in ("jacobi", "gauss-seidel"):
+        raise ValueError(f"unknown method {method!r}")
+    if norm not in ("l1", "linf"):
+        raise ValueError(f"unknown norm {norm!r}")
+    if extrapolation not in (None, "aitken", "quadratic"):
+        raise ValueError(f"unknown extrapolation {extrapolation!r}")
+
+    graph = link_graph(corpus)
+    N = len(graph.pages)
+    if N == 0:
+        return {}
+
+    # Initializing the ranks for each page at 1 / N, or from the last run
+    if initial is None:
+        ranks = [1 / N] * N
+    else:
+        ranks = seed_ranks(graph, damping_factor, initial)
+
+    # Last iterates kept for the extrapolation
+    history = [ranks]
+    keep = {None: 0, "aitken": 3, "quadratic": 4}[extrapolation]
+
+    iterations = 0
+    extrapolations = 0
+    residuals = []
+    converged = False
+    while max_iterations is None or iterations < max_iterations:
+        if method == "jacobi":
+            NewRanks = graph.step(ranks, damping_factor)
+        else:
+            NewRanks = graph.sweep(ranks[:], damping_factor)
+        iterations += 1
+
+        changes = [abs(new - old) for new, old in zip(NewRanks, ranks)]
+        change = sum(changes) if norm == "l1" else max(changes)
+        residuals.append(change)
+        ranks = NewRanks
+        if change < tolerance:
+            converged = True
+            break
+
+        if keep:
+            history = history[1 - keep:] + [ranks]
+            if len(history) == keep and iterations % extrapolate_every == 0:
+                if extrapolation == "aitken":
+                    ranks = aitken(*history)
+                else:
+                    ranks = quadratic_extrapolation(*history)
+                extrapolations += 1
+                history = [ranks]
+
+    # Rounding can leave the total slightly off 1
+    total = sum(ranks)
+    ranks = [rank / total for rank in ranks]
+
+    if stats is not None:
+        stats.update(
+            method=method,
+            norm=norm,
+            tolerance=tolerance,
+            extrapolation=extrapolation,
+            iterations=iterations,
+            extrapolations=extrapolations,
+            edge_touches=iterations * len(graph.sources),
+            residuals=residuals,
+            converged=converged,
+        )
+    return dict(zip(graph.pages, ranks))
+
+
+def aitken(x0, x1, x2):
+    """
+    Return the Aitken delta-squared extrapolation of three successive
+    iterates, page by page. Pages whose differences do not shrink, or
+    whose extrapolated rank would not be positive, keep their rank in `x2`.
+    """
+    ranks = []
+    for a, b, c in zip(x0, x1, x2):
+        denominator = c - 2 * b + a
+        rank = c - (c - b) ** 2 / denominator if denominator else c
+        ranks.append(rank if rank > 0 else c)
+    total = sum(ranks)
+    return [rank / total for rank in ranks]
+
+
+def quadratic_extrapolation(x0, x1, x2, x3):
+    """
+    Return the quadratic extrapolation (Kamvar et al., 2003) of four
+    successive iterates: it assumes the last ones are a combination of the
+    limit and the two slowest-decaying error terms, solves for them by
+    least squares and keeps the limit.
+    """
+    y1 = [b - a for a, b in zip(x0, x1)]
+    y2 = [c - a for a, c in zip(x0, x2)]
+    y3 = [d - a for a, d in zip(x0, x3)]
+
+    def dot(u, v):
+        return sum(a * b for a, b in zip(u, v))
+
+    # Normal equations of the least-squares problem [y1 y2] g = -y3
+    a11, a12, a22 = dot(y1, y1), dot(y1, y2), dot(y2, y2)
+    r1, r2 = -dot(y1, y3), -dot(y2, y3)
+    determinant = a11 * a22 - a12 * a12
+    if not determinant:
+        return x3
+    g1 = (r1 * a22 - r2 * a12) / determinant
+    g2 = (a11 * r2 - a12 * r1) / determinant
+
+    b0, b1, b2 = g1 + g2 + 1, g2 + 1, 1
+    ranks = [b0 * b + b1 * c + b2 * d for b, c, d in zip(x1, x2, x3)]
+    total = sum(ranks)
+    if total <= 0 or min(ranks) < 0:
+        return x3
+    return [rank / total for rank in ranks]
+
+
+def personalized_pagerank(
+    corpus, damping_factor, teleports, tolerance=TOLERANCE, max_iterations=None,
+    memory=PERSONALIZED_MEMORY, stats=None
+):
+    """
+    Return personalized PageRank values for each of `teleports`, a list of
+    seed sets: each one either a dictionary from pages to positive weights
+    or a non-empty iterable of pages, weighted equally. The random surfer's
+    jumps (and the rank of pages without links) go to the seed pages, in
+    proportion to their weights, rather than to any page.
+
+    The seed sets are iterated together, as the columns of one block that
+    shares a single slicing of the links of the corpus. Blocks are limited
+    to about `memory` bytes of ranks, so large numbers of seed sets are
+    processed a chunk of columns at a time. Every column iterates until it
+    moves by less than `tolerance` (L1) or after `max_iterations`
+    iterations.
+
+    Return a list with one dictionary of ranks per seed set, in order. If
+    `stats` is a dictionary, the number and width of the chunks and the
+    iterations each seed set took are stored in it.
     """
-    probs = copy.deepcopy(corpus)
-    N = len(probs)
+    graph = link_graph(corpus)
+    N = len(graph.pages)
+    distributions = []
+    for seeds in teleports:
+        if not isinstance(seeds, dict):
+            seeds = dict.fromkeys(seeds, 1)
+        if not seeds:
+            raise ValueError("empty seed set")
+        for page, weight in seeds.items():
+            if page not in graph.index:
+                raise ValueError(f"unknown page {page!r}")
+            if not weight > 0:
+                raise ValueError(f"weight of {page!r} must be positive")
+        total = sum(seeds.values())
+        distribution = {}
+        for page, weight in seeds.items():
+            distribution[graph.index[page]] = weight / total
+        distributions.append(distribution)
+
+    # A column is one rank per page, a Python float in a list (about 32
+    # bytes), and the rank of the newest iteration sits next to it
+    width = max(1, memory // (2 * 32 * max(N, 1)))
+    results = []
+    iterations = []
+    for start in range(0, len(distributions), width):
+        columns, counts = personalized_block(
+            graph, damping_factor, distributions[start:start + width], tolerance, max_iterations
+        )
+        iterations.extend(counts)
+        for ranks in columns:
+            results.append(dict(zip(graph.pages, ranks)))
+
+    if stats is not None:
+        stats.update(
+            columns_per_chunk=width,
+            chunks=math.ceil(len(distributions) / width),
+            iterations=iterations,
+        )
+    return results
 
-    # Initializing the ranks for each page at 1 / N
-    for p in probs:
-        probs[p] = 1 / N
 
-    # We want to keep updating all of the probabilities until "flag" indicates
-    # us that we're not getting closer than 0.001 for some value in our ranks.
+def personalized_block(graph, damping_factor, distributions, tolerance, max_iterations):
+    """
+    Run the personalized PageRank iteration for a block of teleport
+    `distributions` (dictionaries from page ids to probabilities) together.
+    Return the ranks, one list of N values per distribution, and the number
+    of iterations each one took.
+    """
+    N = len(graph.pages)
+    out_degree = graph.out_degree
+
+    # The inbound links of every page, sliced out once for the whole block.
+    # Each iteration walks them for every column still moving; columns drop
+    # out of the block as soon as they converge.
+    inbound = [graph.sources[graph.in_offsets[i]:graph.in_offsets[i + 1]] for i in range(N)]
+
+    # Every column starts from its own teleport distribution
+    columns = []
+    for distribution in distributions:
+        ranks = [0.0] * N
+        for i, probability in distribution.items():
+            ranks[i] = probability
+        columns.append(ranks)
+
+    iterations = [0] * len(distributions)
+    active = list(range(len(distributions)))
+    while active:
+        moving = []
+        for b in active:
+            ranks = columns[b]
+
+            # Rank of the pages without links goes back to the seeds
+            dangling = sum(ranks[i] for i in graph.dangling)
+            jump = (1 - damping_factor) + damping_factor * dangling
+
+            share = [
+                rank / degree if degree else 0
+                for rank, degree in zip(ranks, out_degree)
+            ]
+            NewRanks = [damping_factor * sum(map(share.__getitem__, links)) for links in inbound]
+            for i, probability in distributions[b].items():
+                NewRanks[i] += jump * probability
+
+            change = sum(abs(new - old) for new, old in zip(NewRanks, ranks))
+            columns[b] = NewRanks
+            iterations[b] += 1
+            if change >= tolerance and (max_iterations is None or iterations[b] < max_iterations):
+                moving.append(b)
+        active = moving
+    return columns, iterations
+
+
+def update_pagerank(corpus, damping_factor, previous, stats=None):
+    """
+    Return PageRank values for each page of a corpus that changed a little
+    since `previous`, the ranks computed for it last time.
+
+    Rather than sweeping the whole corpus until convergence, one sweep
+    measures the residual of the previous ranks (how much a full iteration
+    would still move each page), and only the pages whose residual is
+    large enough push it along their links, so the work stays near the
+    pages that changed. It stops once the residuals add up to less than
+    TOLERANCE, the same criterion as iterate_pagerank.
+
+    If `stats` is a dictionary, the pushes, links followed and equivalent
+    iterations are stored in it, along with those of a cold start and how
+    many of them were saved. The cold start's iterations are the ones
+    recorded with `previous` when it was loaded from a file saved after a
+    cold start; otherwise they are an upper bound.
+
+    The result keeps the cold start's iterations of `previous` for later
+    updates to compare against.
+    """
+    graph = link_graph(corpus)
+    N = len(graph.pages)
+    if N == 0:
+        return {}
+    out_offsets, targets = graph.out_offsets, graph.targets
+    E = len(graph.sources)
+
+    ranks = seed_ranks(graph, damping_factor, previous)
+    residual = [new - old for new, old in zip(graph.step(ranks, damping_factor), ranks)]
+    touches = E
+
+    # Pushing a residual `r` from page u adds it to u's rank and passes
+    # damping_factor * r along u's links, split evenly. Pages without links
+    # pass it to every page, which is kept aside in `uniform` until it is
+    # large enough to be worth adding to all of them.
+    threshold = TOLERANCE / (2 * N)
+    uniform = 0
+    pushes = 0
+    queue = deque(i for i in range(N) if abs(residual[i]) > threshold)
+    queued = bytearray(N)
+    for i in queue:
+        queued[i] = 1
     while True:
-        flag = True
-        for p in probs:
-            
-            # To calcutate the second term we have to iterate through all 
-            # of the pages that link to the page whose rank we want to calculate
-            SecondTerm = 0
-            PagesThatLinkTo_i = PagesThatLinkTo(corpus, p)
-            for i in PagesThatLinkTo_i:
-
-                # As there might be pages with no links because of the way our function
-                # PagesThatLinkTo works, we would like to take care of this case and treat 
-                # it as if that page with no links, links to every single page
-                try:
-                    SecondTerm += probs[i] / len(corpus[i])
-                except ZeroDivisionError:
-                    SecondTerm += probs[i] / N
-            NewProb = (1 - damping_factor) / N + damping_factor * SecondTerm
-
-            # We check if the values aren't changing that much
-            if abs(probs[p] - NewProb) > 0.001:
-                flag = False
-                
-            # Updating the values of the ranks
-            probs[p] = NewProb
-        if flag:
+        while queue:
+            u = queue.popleft()
+            queued[u] = 0
+            r = residual[u]
+            residual[u] = 0
+            ranks[u] += r
+            pushes += 1
+            start, stop = out_offsets[u], out_offsets[u + 1]
+            if start == stop:
+                uniform += damping_factor * r / N
+                continue
+            share = damping_factor * r / (stop - start)
+            touches += stop - start
+            for v in targets[start:stop]:
+                residual[v] += share
+                if not queued[v] and abs(residual[v]) > threshold:
+                    queued[v] = 1
+                    queue.append(v)
+
+        if abs(uniform) * N <= TOLERANCE / 2:
             break
-    return probs
+        for v in range(N):
+            residual[v] += uniform
+            if not queued[v] and abs(residual[v]) > threshold:
+                queued[v] = 1
+                queue.append(v)
+        uniform = 0
+
+    # Adding what is left of the residuals amounts to one last iteration
+    ranks = [rank + r + uniform for rank, r in zip(ranks, residual)]
+    total = sum(ranks)
+    ranks = [rank / total for rank in ranks]
+
+    cold = getattr(previous, "cold_iterations", None)
+    if stats is not None:
+        if cold is None:
+            # From 1 / N, the first sweep moves the ranks by at most
+            # 2 * damping_factor and every sweep shrinks that by damping_factor
+            cold = math.ceil(math.log(TOLERANCE / (2 * damping_factor)) / math.log(damping_factor)) + 1
+        iterations = math.ceil(touches / E) if E else 1
+        stats.update(
+            pushes=pushes,
+            edge_touches=touches,
+            iterations=iterations,
+            cold_iterations=cold,
+            cold_edge_touches=cold * E,
+            iterations_saved=cold - iterations,
+            edge_touches_saved=cold * E - touches,
+        )
+    return Ranks(zip(graph.pages, ranks), getattr(previous, "cold_iterations", None))
+
+
+def seed_ranks(graph, damping_factor, previous):
+    """
+    Return a starting rank vector for `graph` from the ranks of an earlier
+    run, `previous`. Pages that were already ranked keep their rank; new
+    pages start from the random jump's share plus what the ranked pages
+    linking to them pass along. The result is scaled to add up to 1.
+    """
+    N = len(graph.pages)
+    ranks = [previous.get(page) for page in graph.pages]
+    if all(rank is None for rank in ranks):
+        return [1 / N] * N
+
+    share = [
+        rank / degree if rank is not None and degree else 0
+        for rank, degree in zip(ranks, graph.out_degree)
+    ]
+    for i in range(N):
+        if ranks[i] is None:
+            inbound = graph.sources[graph.in_offsets[i]:graph.in_offsets[i + 1]]
+            ranks[i] = (1 - damping_factor) / N + damping_factor * sum(map(share.__getitem__, inbound))
+
+    total = sum(ranks)
+    return [rank / total for rank in ranks]
+
+
+def save_ranks(path, ranks, cold_iterations=None):
+    """
+    Write the `ranks` of a run to `path`, with the pages in sorted order,
+    along with the number of iterations the last cold start took (by
+    default, the one `ranks` carries, if any).
+    """
+    if cold_iterations is None:
+        cold_iterations = getattr(ranks, "cold_iterations", None)
+    pages = sorted(ranks)
+    with open(path, "w") as f:
+        json.dump({
+            "pages": pages,
+            "ranks": [ranks[page] for page in pages],
+            "cold_iterations": cold_iterations,
+        }, f)
+
+
+def load_ranks(path):
+    """
+    Return the ranks saved by save_ranks at `path`, as Ranks.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    return Ranks(zip(data["pages"], data["ranks"]), data.get("cold_iterations"))
+
+
+class Ranks(dict):
+    """
+    Dictionary from pages to ranks that also remembers how many iterations
+    the last cold start took, for update_pagerank to compare against.
+    """
+
+    def __init__(self, ranks, cold_iterations=None):
+        super().__init__(ranks)
+        self.cold_iterations = cold_iterations
+
+
+class LinkGraph():
+    """
+    Compiled form of a corpus for the PageRank iteration.
+
+    Pages get dense ids (their position in `pages`, in sorted order). The
+    ids of the pages linking to page `i` are `sources[in_offsets[i]:in_offsets[i + 1]]`,
+    a sparse column-by-column (CSR) layout of the link matrix kept in typed
+    arrays, next to each page's number of links and the ids of the dangling
+    pages, the ones without links. The links of page `i` themselves are
+    `targets[out_offsets[i]:out_offsets[i + 1]]`, in sorted order.
+    """
+
+    def __init__(self, corpus):
+        self.pages = sorted(corpus)
+        self.index = {page: i for i, page in enumerate(self.pages)}
+        N = len(self.pages)
+        self.out_degree = array("i", (len(corpus[page]) for page in self.pages))
+        self.out_offsets = array("i", accumulate(self.out_degree, initial=0))
+        self.targets = array("i", (
+            j for page in self.pages for j in sorted(map(self.index.__getitem__, corpus[page]))
+        ))
+        self.dangling = array("i", (i for i in range(N) if not self.out_degree[i]))
+
+        # Counting sort of the links by target: count the links into each
+        # page, turn the counts into offsets, then drop every source into
+        # the next free slot of its target
+        counts = [0] * (N + 1)
+        for j in self.targets:
+            counts[j + 1] += 1
+        self.in_offsets = array("i", accumulate(counts))
+        self.sources = array("i", [0]) * self.in_offsets[N]
+        free = list(self.in_offsets[:N])
+        for i in range(N):
+            for j in self.targets[self.out_offsets[i]:self.out_offsets[i + 1]]:
+                self.sources[free[j]] = i
+                free[j] += 1
+
+    def step(self, ranks, damping_factor):
+        """
+        Return the ranks after one PageRank iteration from `ranks`.
+        """
+        N = len(self.pages)
+        in_offsets, sources = self.in_offsets, self.sources
+
+        # Pages with no links spread their rank over every page, so together
+        # they only add the same amount to everyone
+        dangling = sum(ranks[i] for i in self.dangling)
+        base = (1 - damping_factor) / N + damping_factor * dangling / N
+
+        # What each page passes along each one of its links
+        share = [
+            rank / degree if degree else 0
+            for rank, degree in zip(ranks, self.out_degree)
+        ]
+        return [
+            base + damping_factor * sum(map(share.__getitem__, sources[in_offsets[i]:in_offsets[i + 1]]))
+            for i in range(N)
+        ]
+
+    def sweep(self, ranks, damping_factor):
+        """
+        Update `ranks` in place with one Gauss-Seidel sweep, in page order,
+        rescale them to add up to 1 and return them.
+        """
+        N = len(self.pages)
+        in_offsets, sources, out_degree = self.in_offsets, self.sources, self.out_degree
+        dangling = sum(ranks[i] for i in self.dangling)
+        share = [
+            rank / degree if degree else 0
+            for rank, degree in zip(ranks, out_degree)
+        ]
+        for i in range(N):
+            rank = (1 - damping_factor) / N + damping_factor * (
+                dangling / N + sum(map(share.__getitem__, sources[in_offsets[i]:in_offsets[i + 1]]))
+            )
+
+            # Later pages see this page's new rank right away
+            if out_degree[i]:
+                share[i] = rank / out_degree[i]
+            else:
+                dangling += rank - ranks[i]
+            ranks[i] = rank
+
+        # In-place updates do not keep the total at 1, and letting it drift
+        # slows the convergence down
+        total = sum(ranks)
+        ranks[:] = [rank / total for rank in ranks]
+        return ranks
+
+    def __len__(self):
+        return len(self.pages)
+
+
+class Corpus(dict):
+    """
+    Corpus returned by crawl(directory, index=True).
+
+    Still a dictionary from each page to the set of pages it links to, but
+    with the link structure indexed once up front: `reverse` maps each page
+    to the set of pages linking to it, `out_degree` to its number of links,
+    `dangling` is the set of pages without links and `graph` the compiled
+    LinkGraph. The indexes are not kept up to date if the corpus is
+    modified afterwards.
+    """
+
+    def __init__(self, pages):
+        super().__init__(pages)
+        self.reverse = {page: set() for page in self}
+        for page, links in self.items():
+            for link in links:
+                self.reverse[link].add(page)
+        self.out_degree = {page: len(links) for page, links in self.items()}
+        self.dangling = {page for page, links in self.items() if not links}
+        self.graph = LinkGraph(self)
+
+
+def link_graph(corpus):
+    """
+    Returns the LinkGraph of `corpus`, compiling it unless it is a Corpus.
+    """
+    if isinstance(corpus, Corpus):
+        return corpus.graph
+    return LinkGraph(corpus)
+
+
+def write_edge_list(corpus, path):
+    """
+    Write the links of `corpus` to `path` as a binary edge list: the header
+    (EDGE_LIST_HEADER), the int32 source ids of every link, their int32
+    target ids, and the page names one per line, in id order. Pages get ids
+    in sorted order and links are sorted by source, then target.
+    """
+    pages = sorted(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    names = "\n".join(pages).encode()
+    E = sum(len(links) for links in corpus.values())
+
+    with open(path, "wb") as f:
+        f.write(EDGE_LIST_HEADER.pack(EDGE_LIST_MAGIC, len(pages), E, len(names)))
+        for i, page in enumerate(pages):
+            f.write(array("i", [i]) * len(corpus[page]))
+        for page in pages:
+            f.write(array("i", sorted(map(index.__getitem__, corpus[page]))))
+        f.write(names)
+
+
+class EdgeList():
+    """
+    Binary edge list written by write_edge_list, memory-mapped rather than
+    read: `sources` and `targets` are int32 views into the file, so only the
+    pages of it being looked at are actually loaded.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.page_count, self.edge_count, names = EDGE_LIST_HEADER.unpack_from(self.map)
+        if magic != EDGE_LIST_MAGIC:
+            self.map.close()
+            raise ValueError(f"{path} is not an edge list")
+
+        self.view = memoryview(self.map)
+        start = EDGE_LIST_HEADER.size
+        middle = start + 4 * self.edge_count
+        end = middle + 4 * self.edge_count
+        self.sources = self.view[start:middle].cast("i")
+        self.targets = self.view[middle:end].cast("i")
+        self.names = self.view[end:end + names]
+
+    def pages(self):
+        """
+        Return the list of page names, by id.
+        """
+        if not self.page_count:
+            return []
+        return bytes(self.names).decode().split("\n")
+
+    def blocks(self, size):
+        """
+        Yield the (sources, targets) views of the links `size` at a time.
+        Each pair of views is released once the next one is asked for.
+        """
+        for start in range(0, self.edge_count, size):
+            with self.sources[start:start + size] as sources, \
+                    self.targets[start:start + size] as targets:
+                yield sources, targets
+
+    def close(self):
+        # The file can only be unmapped once no view into it is left
+        for view in (self.sources, self.targets, self.names, self.view):
+            view.release()
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def stream_pagerank(path, damping_factor, tolerance=TOLERANCE, max_iterations=None,
+                    block=EDGE_BLOCK, stats=None):
+    """
+    Return PageRank values for each page of the edge list at `path`, as
+    iterate_pagerank does, but streaming the links from disk `block` at a
+    time on every iteration, so that only the rank vectors (and the pages'
+    out-degrees) are held in memory.
+
+    If `stats` is a dictionary, the number of iterations and of links read
+    are stored in it.
+    """
+    with EdgeList(path) as edges:
+        N = edges.page_count
+        if N == 0:
+            return {}
+
+        # Out-degrees, from one pass over the sources
+        out_degree = array("i", [0]) * N
+        for sources, _ in edges.blocks(block):
+            for s in sources:
+                out_degree[s] += 1
+        dangling = array("i", (i for i in range(N) if not out_degree[i]))
+
+        # Initializing the ranks for each page at 1 / N
+        ranks = array("d", [1 / N]) * N
+        iterations = 0
+        while max_iterations is None or iterations < max_iterations:
+            share = array("d", (
+                rank / degree if degree else 0
+                for rank, degree in zip(ranks, out_degree)
+            ))
+            inbound = array("d", [0]) * N
+            for sources, targets in edges.blocks(block):
+                for s, t in zip(sources, targets):
+                    inbound[t] += share[s]
+
+            # Pages with no links spread their rank over every page
+            base = (1 - damping_factor) / N + damping_factor * sum(ranks[i] for i in dangling) / N
+            NewRanks = array("d", (base + damping_factor * x for x in inbound))
+            iterations += 1
+
+            change = sum(abs(new - old) for new, old in zip(NewRanks, ranks))
+            ranks = NewRanks
+            if change < tolerance:
+                break
+
+        pages = edges.pages()
+
+    if stats is not None:
+        stats.update(iterations=iterations, edge_touches=(iterations + 1) * edges.edge_count)
+    return dict(zip(pages, ranks))
+
 
 if __name__ == "__main__":
     main()
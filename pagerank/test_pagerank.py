@@ -0,0 +1,54 @@
+import os
+import random
+import tempfile
+import unittest
+
+import pagerank
+
+# Pages whose links are easy to cut in two at a chunk boundary
+PAGES = [
+    '<a href="1.html">1</a> <a href="2.html">2</a>',
+    '<a title="a<b" href="x.html">x</a>',
+    '<a title="a>b" href="y.html">y</a> <a href="z.html">',
+    '<a title="<a" href="1.html"> <a\nhref="2.html">',
+    '<a href="x>y.html">x</a><<<a href="3.html">',
+    '<a  class="c"\n\thref="4.html"><b>no</b> <abbr href="5.html">',
+    '<a href="unterminated.html',
+    '<p>text</p><a href=""></a><a',
+    '<',
+]
+
+
+class ExtractLinksTest(unittest.TestCase):
+
+    def setUp(self):
+        self.chunk = pagerank.CHUNK
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        pagerank.CHUNK = self.chunk
+        self.directory.cleanup()
+
+    def check(self, text):
+        path = os.path.join(self.directory.name, "page.html")
+        with open(path, "w") as f:
+            f.write(text)
+        expected = set(pagerank.LINK.findall(text))
+        for chunk in range(1, max(48, len(text) + 2)):
+            pagerank.CHUNK = chunk
+            with self.subTest(text=text, chunk=chunk):
+                self.assertEqual(pagerank.extract_links(path), expected)
+
+    def test_pages(self):
+        for text in PAGES:
+            self.check(text)
+
+    def test_random_pages(self):
+        rng = random.Random(0)
+        pieces = ["<a", " ", "\n", "href=", '"', "<", ">", "a", "x.html", 'title="', "<p>"]
+        for _ in range(100):
+            self.check("".join(rng.choice(pieces) for _ in range(rng.randrange(40))))
+
+
+if __name__ == "__main__":
+    unittest.main()